@@ -1,21 +1,35 @@
 import logging
-from flask import Flask
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from common import SECRET_KEY, JWT_EXPIRATION_DELTA
-from contract_templates_api import templates_bp, ensure_contract_templates_schema
-from contracts_api import contracts_bp, ensure_contracts_schema
+import common
+from json_provider import FastJSONProvider
+from common import SECRET_KEY, JWT_EXPIRATION_DELTA, MAX_CONTENT_LENGTH
+from contract_templates_api import templates_bp
+from contracts_api import contracts_bp
 from auth_api import auth_bp
-from ocr_api import ocr_bp
+from ocr_api import InMemoryUploadRequest, ocr_bp
 from notify_api import notify_bp
 from rooms_api import rooms_bp
 from tenants_api import tenants_bp
 from moves_api import moves_bp
 from repair_records_api import repair_bp
-import forgot_password as fp
+from export_api import export_bp
+from import_api import import_bp
+from metrics_api import metrics_bp, register as register_metrics
+import compression
+import response_cache
+import shared_cache
+import ocr_cache
+import ocr_engine
+import ocr_jobs
+import migrations
 
 
 app = Flask(__name__)
+# JSON 编码：安装了 orjson 时使用 orjson
+app.json = FastJSONProvider(app)
 # 允许跨域并显式声明方法与请求头，确保带 Authorization 的预检通过
 CORS(
     app,
@@ -23,9 +37,9 @@ CORS(
         r"/api/*": {
             "origins": "*",
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
-            # 暴露刷新令牌相关响应头，便于前端读取
-            "expose_headers": ["Content-Type", "X-Refreshed-Token", "X-Token-Expires"],
+            "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+            # 暴露刷新令牌与 ETag 响应头，便于前端读取
+            "expose_headers": ["Content-Type", "X-Refreshed-Token", "X-Token-Expires", "ETag"],
         }
     },
     supports_credentials=True,
@@ -34,34 +48,47 @@ CORS(
 # 应用基础配置（集中在 common.py）
 app.config['SECRET_KEY'] = SECRET_KEY
 app.config['JWT_EXPIRATION_DELTA'] = JWT_EXPIRATION_DELTA
+# 请求体上限（OCR 接口另有更低的上限，见 ocr_api）；较小的上传文件保留在内存中
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.request_class = InMemoryUploadRequest
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    limit = request.max_content_length
+    return jsonify({'error': f'上传内容过大（上限 {limit // (1024 * 1024)} MB）'}), 413
+
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 app.logger.setLevel(logging.INFO)
 
+# 每个工作线程复用一个数据库连接，应用上下文结束时归还
+common.init_app(app)
 
-# 初始化找回密码模块（如存在则进行初始化）
-try:
-    fp.ensure_schema()
-    # 设置一个默认的恢复信息，避免首次使用时没有配置
-    fp.set_recovery_info('admin', security_answer='15286304124')
-except Exception as e:
-    app.logger.warning(f"初始化找回密码模块失败: {e}")
+# 热点只读接口的响应缓存（进程内 + 跨进程共享），命中率见 /api/metrics
+response_cache.init_app(app)
+register_metrics('response_cache', response_cache.cache.stats)
+register_metrics('shared_cache', shared_cache.stats)
 
+# 响应压缩（br/gzip，按 Accept-Encoding 协商），压缩率见 /api/metrics
+compression.init_app(app)
+register_metrics('compression', compression.stats.stats)
+# OCR 模型加载与推理计数（模型在工作进程内复用）
+register_metrics('ocr', ocr_engine.registry.stats)
+register_metrics('ocr_jobs', ocr_jobs.stats)
+register_metrics('ocr_cache', ocr_cache.stats)
 
-# 注册各功能蓝图
-try:
-    ensure_contract_templates_schema()
-    app.register_blueprint(templates_bp)
-except Exception as e:
-    app.logger.warning(f"注册合同模板模块失败: {e}")
 
-# 注册合同档案蓝图
+# 数据库结构版本检查：仅读取 schema_version；落后时才迁移（迁移本身串行执行）
 try:
-    ensure_contracts_schema()
-    app.register_blueprint(contracts_bp)
+    migrations.ensure_current()
 except Exception as e:
-    app.logger.warning(f"注册合同档案模块失败: {e}")
+    app.logger.warning(f"数据库结构迁移失败: {e}")
 
+
+# 注册各功能蓝图
+app.register_blueprint(templates_bp)
+app.register_blueprint(contracts_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(ocr_bp)
 app.register_blueprint(notify_bp)
@@ -69,6 +96,9 @@ app.register_blueprint(rooms_bp)
 app.register_blueprint(tenants_bp)
 app.register_blueprint(moves_bp)
 app.register_blueprint(repair_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(import_bp)
+app.register_blueprint(metrics_bp)
 
 
 if __name__ == "__main__":
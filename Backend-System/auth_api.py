@@ -1,69 +1,123 @@
 import hashlib
+import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 
 import jwt
 from flask import Blueprint, request, jsonify, make_response
 
-from common import connect, SECRET_KEY, JWT_EXPIRATION_DELTA
+from common import connect, SECRET_KEY, JWT_EXPIRATION_DELTA, TOKEN_REFRESH_THRESHOLD, ADMIN_CACHE_TTL
 import forgot_password as fp
 
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
+def _bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+# 已认证管理员记录的进程内缓存：username -> (过期时间, 记录)
+_admin_cache = {}
+_admin_cache_lock = threading.Lock()
+
+
+def load_admin(username):
+    """Return ``{'id', 'username', 'full_name'}`` for ``username`` (``None`` if absent).
+
+    Found records are reused for ``ADMIN_CACHE_TTL`` seconds. ``forget_admin``
+    only clears this worker's cache, so an admin deleted or renamed in the
+    database can keep authenticating on other workers for at most that long.
+    Misses are not cached: a newly created admin is accepted at once.
+    """
+    now = time.monotonic()
+    entry = _admin_cache.get(username)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, username, full_name FROM admins WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    conn.close()
 
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
+    if row is None:
+        with _admin_cache_lock:
+            _admin_cache.pop(username, None)
+        return None
+    user = {'id': row[0], 'username': row[1], 'full_name': row[2]}
+    with _admin_cache_lock:
+        _admin_cache[username] = (now + ADMIN_CACHE_TTL, user)
+    return user
+
+
+def forget_admin(username=None):
+    """Drop the cached record of ``username`` (all records when ``None``) after an account change."""
+    with _admin_cache_lock:
+        if username is None:
+            _admin_cache.clear()
+        else:
+            _admin_cache.pop(username, None)
+
+
+def authenticate():
+    """校验请求携带的令牌，返回 (current_user, 令牌过期时间戳, None) 或 (None, None, 错误信息)"""
+    token = _bearer_token()
+    if not token:
+        return None, None, '缺少认证令牌'
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return None, None, '认证令牌已过期，请重新登录'
+    except jwt.InvalidTokenError:
+        return None, None, '无效的认证令牌'
+
+    current_user = load_admin(data.get('username'))
+    if not current_user:
+        return None, None, '无效的认证令牌'
+    return current_user, data.get('exp'), None
+
+
+def _refresh_token(response, current_user):
+    """活动续期：签发一个新的令牌并通过响应头返回"""
+    new_expiry = datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION_DELTA)
+    new_token = jwt.encode(
+        {
+            'username': current_user['username'],
+            'full_name': current_user['full_name'],
+            'exp': new_expiry,
+        },
+        SECRET_KEY,
+        algorithm="HS256",
+    )
+    resp = make_response(response)
+    resp.headers['X-Refreshed-Token'] = new_token
+    resp.headers['X-Token-Expires'] = new_expiry.isoformat()
+    return resp
 
-        if not token:
-            return jsonify({'error': '缺少认证令牌'}), 401
 
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-
-            conn = connect()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM admins WHERE username = ?", (data['username'],))
-            user_data = cursor.fetchone()
-            conn.close()
-
-            if not user_data:
-                return jsonify({'error': '无效的认证令牌'}), 401
-
-            current_user = {
-                'id': user_data[0],
-                'username': user_data[1],
-                'full_name': user_data[3]
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': '认证令牌已过期，请重新登录'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': '无效的认证令牌'}), 401
-
-        # 成功认证后：活动续期——签发一个新的令牌并通过响应头返回
+            current_user, expires_at, error = authenticate()
+        except sqlite3.OperationalError as e:
+            # 友好提示数据库未初始化或路径不一致
+            return jsonify({'error': f'数据库未初始化或不可用：{e}'}), 500
+        if error:
+            return jsonify({'error': error}), 401
+
         response = f(current_user=current_user, *args, **kwargs)
+        # 剩余有效期仍充足时不重新签发，避免每个请求都签名一次
+        if expires_at and expires_at - time.time() > TOKEN_REFRESH_THRESHOLD:
+            return response
         try:
-            new_expiry = datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION_DELTA)
-            new_token = jwt.encode(
-                {
-                    'username': current_user['username'],
-                    'full_name': current_user['full_name'],
-                    'exp': new_expiry,
-                },
-                SECRET_KEY,
-                algorithm="HS256",
-            )
-            resp = make_response(response)
-            resp.headers['X-Refreshed-Token'] = new_token
-            resp.headers['X-Token-Expires'] = new_expiry.isoformat()
-            return resp
+            return _refresh_token(response, current_user)
         except Exception:
             # 如果续期失败，不影响原始响应
             return response
@@ -115,6 +169,7 @@ def forgot_password():
 
     ok, msg = fp.verify_and_reset_password(username, answer, new_password)
     if ok:
+        forget_admin(username)
         return jsonify({'message': msg})
     else:
         return jsonify({'error': msg}), 400
@@ -155,5 +210,6 @@ def change_password(current_user):
     )
     conn.commit()
     conn.close()
+    forget_admin(current_user['username'])
 
     return jsonify({'message': '密码修改成功'})
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""Before/after benchmark for the hot-query index migration.
+
+Builds a throwaway database with synthetic data (100k tenants by default),
+times the hot query shapes on the baseline schema, applies the index
+migration and times them again.
+
+    python benchmarks/bench_indexes.py [--tenants 100000] [--rooms 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import common
+import migrations
+
+BASELINE_VERSION = 1
+INDEX_VERSION = 2
+
+QUERIES = {
+    'rooms_list': (
+        """
+        SELECT r.id,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM tenants t
+                   WHERE t.room_id = r.id AND t.status = '在住'
+                     AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
+               ) THEN '已入住' ELSE '空闲' END,
+               (SELECT COUNT(*) FROM tenants t
+                WHERE t.room_id = r.id AND t.status = '在住'
+                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date)
+        FROM rooms r ORDER BY r.room_no
+        """,
+        (),
+    ),
+    'tenants_expired': (
+        "SELECT COUNT(*) FROM tenants WHERE status = '在住' AND DATE('now') > check_out_date",
+        (),
+    ),
+    'room_tenants': (
+        "SELECT id, name FROM tenants WHERE room_id = ? AND status = '在住' ORDER BY name",
+        ('room_id',),
+    ),
+    'repairs_by_room': (
+        "SELECT id, report_date FROM repair_records WHERE room_no = ? ORDER BY report_date DESC",
+        ('room_no',),
+    ),
+    'moves_by_room': (
+        "SELECT COUNT(*) FROM tenant_moves WHERE old_room_id = ? OR new_room_id = ?",
+        ('room_id', 'room_id'),
+    ),
+    'moves_by_tenant': (
+        "SELECT COUNT(*) FROM tenant_moves WHERE tenant_id = ?",
+        ('tenant_id',),
+    ),
+    'contracts_by_template': (
+        "SELECT COUNT(*) FROM contracts WHERE template_id = ?",
+        ('template_id',),
+    ),
+}
+
+
+def populate(conn, n_tenants, n_rooms):
+    rnd = random.Random(42)
+    today = date.today()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO rooms (building, floor, room_no, room_type, price) VALUES (?, ?, ?, '单人间', 200)",
+        [(f"{i % 20}座", i % 30, f"R{i:06d}") for i in range(n_rooms)],
+    )
+    tenants = []
+    for i in range(n_tenants):
+        check_in = today - timedelta(days=rnd.randint(0, 1500))
+        check_out = check_in + timedelta(days=rnd.randint(30, 400))
+        # 大部分历史租户已退租，约 5% 在住
+        status = '在住' if rnd.random() < 0.05 else '已退租'
+        tenants.append((f"租户{i}", f"T{i:018d}", f"138{i:08d}", check_in.isoformat(),
+                        check_out.isoformat(), rnd.randint(1, n_rooms), status))
+    cur.executemany(
+        """
+        INSERT INTO tenants (name, id_card, phone, check_in_date, check_out_date, room_id, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        tenants,
+    )
+    cur.executemany(
+        "INSERT INTO repair_records (room_no, repair_type, report_date, status) VALUES (?, '水电', ?, '已完成')",
+        [(f"R{rnd.randrange(n_rooms):06d}", (today - timedelta(days=rnd.randint(0, 1500))).isoformat())
+         for _ in range(n_tenants // 5)],
+    )
+    cur.executemany(
+        "INSERT INTO tenant_moves (tenant_id, old_room_id, new_room_id, move_date) VALUES (?, ?, ?, DATE('now'))",
+        [(rnd.randint(1, n_tenants), rnd.randint(1, n_rooms), rnd.randint(1, n_rooms))
+         for _ in range(n_tenants // 5)],
+    )
+    cur.executemany(
+        "INSERT INTO contract_templates (name, content_html) VALUES (?, '<p></p>')",
+        [(f"模板{i}",) for i in range(20)],
+    )
+    cur.executemany(
+        "INSERT INTO contracts (template_id, tenant_id, rendered_html) VALUES (?, ?, '<p></p>')",
+        [(rnd.randint(1, 20), rnd.randint(1, n_tenants)) for _ in range(n_tenants // 5)],
+    )
+    conn.commit()
+
+
+def run_queries(conn, n_rooms, n_tenants, repeat):
+    rnd = random.Random(7)
+    samples = {
+        'room_id': lambda: rnd.randint(1, n_rooms),
+        'room_no': lambda: f"R{rnd.randrange(n_rooms):06d}",
+        'tenant_id': lambda: rnd.randint(1, n_tenants),
+        'template_id': lambda: rnd.randint(1, 20),
+    }
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        # 全表类查询较慢，少跑几次
+        loops = 3 if not params else repeat
+        start = time.perf_counter()
+        for _ in range(loops):
+            conn.execute(sql, [samples[p]() for p in params]).fetchall()
+        results[name] = (time.perf_counter() - start) / loops * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引迁移前后的热点查询耗时对比")
+    parser.add_argument("--tenants", type=int, default=100_000)
+    parser.add_argument("--rooms", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=200, help="点查类查询的重复次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        common.DB_NAME = os.path.join(tmp, "bench.db")
+        conn = common.connect()
+        migrations.migrate(conn, target=BASELINE_VERSION)
+        populate(conn, args.tenants, args.rooms)
+
+        before = run_queries(conn, args.rooms, args.tenants, args.repeat)
+        migrations.migrate(conn, target=INDEX_VERSION)
+        after = run_queries(conn, args.rooms, args.tenants, args.repeat)
+        conn.close()
+
+    print(f"tenants={args.tenants} rooms={args.rooms}")
+    print(f"{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:<24}{b:>12.3f}{a:>12.3f}{b / a if a else float('inf'):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
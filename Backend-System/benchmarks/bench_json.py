@@ -0,0 +1,115 @@
+"""Buffered vs streamed list responses, with the stdlib and orjson encoders.
+
+Builds a throwaway database with 50k fully populated tenants and requests
+``/api/tenants?fields=all`` through the Flask test client, measuring
+time-to-first-byte, total time and peak Python memory (tracemalloc, measured
+in a separate pass so it does not skew the timings).
+
+    python benchmarks/bench_json.py [--tenants 50000] [--repeat 3]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import common
+import migrations
+
+
+def populate(conn, n_tenants, n_rooms=2000):
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO rooms (building, floor, room_no, room_type, price) VALUES (?, ?, ?, '单人间', 200)",
+        [(f"{i % 20}座", i % 30, f"R{i:06d}") for i in range(n_rooms)],
+    )
+    cur.executemany(
+        """
+        INSERT INTO tenants (
+            name, gender, nation, birth_date, id_card, address, issuing_authority, valid_from, valid_to,
+            phone, emergency_contact_name, emergency_contact_phone, check_in_date, check_out_date,
+            room_id, remarks, status, front_img, back_img
+        ) VALUES (?, '男', '汉', '1990-01-01', ?, ?, '某市公安局', '2015-01-01', '2035-01-01',
+                  ?, '联系人', '13900000000', '2024-01-01', '2025-01-01', ?, '无', '已退租', ?, ?)
+        """,
+        [
+            (f"租户{i}", f"T{i:018d}", f"某省某市某区某街道{i}号", f"138{i:08d}", i % n_rooms + 1,
+             f"/uploads/idcards/{i}_front.jpg", f"/uploads/idcards/{i}_back.jpg")
+            for i in range(n_tenants)
+        ],
+    )
+    cur.execute(
+        "INSERT INTO admins (username, password_hash, full_name) VALUES ('bench', ?, 'bench')",
+        (hashlib.sha256(b'bench').hexdigest(),),
+    )
+    conn.commit()
+
+
+def measure(client, headers, url):
+    """Return ``(ttfb_ms, total_ms, bytes)`` for one request."""
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks, b''))
+    ttfb = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    return ttfb * 1000, (time.perf_counter() - start) * 1000, size
+
+
+def peak_memory(client, headers, url):
+    tracemalloc.start()
+    measure(client, headers, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口缓冲与流式输出的首字节时间与内存峰值对比")
+    parser.add_argument("--tenants", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        common.DB_NAME = os.path.join(tmp, "bench.db")
+        common.CACHE_DB_NAME = os.path.join(tmp, "cache.db")
+        conn = common.connect()
+        migrations.migrate(conn)
+        populate(conn, args.tenants)
+        conn.close()
+
+        import json_provider
+        from app import app
+        client = app.test_client()
+        token = client.post('/api/login', json={'username': 'bench', 'password': 'bench'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        orjson = json_provider.orjson
+        cases = [
+            ('jsonify, stdlib json', None, '/api/tenants?fields=all'),
+            ('jsonify, orjson', orjson, '/api/tenants?fields=all'),
+            ('stream=1, stdlib json', None, '/api/tenants?fields=all&stream=1'),
+            ('stream=1, orjson', orjson, '/api/tenants?fields=all&stream=1'),
+        ]
+        print(f"tenants={args.tenants} orjson={'yes' if orjson else 'not installed'}")
+        print(f"{'mode':<24}{'TTFB ms':>10}{'total ms':>10}{'MB out':>8}{'peak MB':>9}")
+        for name, encoder, url in cases:
+            if encoder is None and name.endswith('orjson'):
+                continue
+            json_provider.orjson = encoder
+            runs = [measure(client, headers, url) for _ in range(args.repeat)]
+            ttfb = min(r[0] for r in runs)
+            total = min(r[1] for r in runs)
+            size = runs[0][2] / 1024 / 1024
+            peak = peak_memory(client, headers, url)
+            print(f"{name:<24}{ttfb:>10.1f}{total:>10.1f}{size:>8.1f}{peak:>9.1f}")
+        json_provider.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
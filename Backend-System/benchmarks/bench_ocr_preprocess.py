@@ -0,0 +1,141 @@
+"""Latency and field accuracy of OCR preprocessing settings.
+
+Runs every image in a directory through PaddleOCR once per preprocessing
+variant (see ``ocr_preprocess``) and reports the mean input size, the mean
+preprocess and inference times, the p95 total time, and the share of ID card
+fields read correctly.
+
+Fields are scored against ``--labels`` when given. That file is a JSON object
+mapping an image file name to the expected fields, for example
+``{"a.jpg": {"name": "张三", "id_card": "110101199003071234"}}``. Without
+labels, the fields read from the unprocessed image serve as the reference,
+so the column shows agreement with the current behaviour instead.
+
+    python benchmarks/bench_ocr_preprocess.py IMAGE_DIR [--labels labels.json] [--repeat 1]
+
+Use real phone photos of cards (test cards or masked copies): card
+detection and the accuracy numbers only mean something on realistic input.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ocr_engine
+import ocr_preprocess
+from ocr_api import _extract_idcard_fields
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+FIELDS = (
+    'name', 'gender', 'nation', 'birth_date', 'id_card', 'address', 'issuing_authority', 'valid_start', 'valid_end',
+)
+
+# (名称, preprocess 配置)；第一项为不做预处理的基准
+VARIANTS = [
+    ('original', {'enabled': False}),
+    ('cap 1600', {'enabled': True, 'max_side': 1600}),
+    ('cap 1280', {'enabled': True, 'max_side': 1280}),
+    ('cap 960', {'enabled': True, 'max_side': 960}),
+    ('crop + cap 1600', {'enabled': True, 'crop_card': True, 'max_side': 1600}),
+    ('crop + cap 1280', {'enabled': True, 'crop_card': True, 'max_side': 1280}),
+    ('crop + cap 960', {'enabled': True, 'crop_card': True, 'max_side': 960}),
+    ('crop + 1280 + gray', {'enabled': True, 'crop_card': True, 'max_side': 1280, 'grayscale': True}),
+    ('crop + 1280 + clahe', {'enabled': True, 'crop_card': True, 'max_side': 1280, 'contrast': 'clahe'}),
+]
+
+
+def run_variant(paths, cfg, repeat):
+    """Per image: ``(pixels, preprocess_ms, inference_ms, fields, cropped)`` (best of ``repeat`` runs)."""
+    results = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        best = None
+        for _ in range(repeat):
+            # 计时包含解码：original 行即为只解码、不做预处理
+            start = time.perf_counter()
+            image, info = ocr_preprocess.preprocess(data, cfg)
+            pre_ms = (time.perf_counter() - start) * 1000
+            shape = image.shape
+            start = time.perf_counter()
+            lines = ocr_engine.registry.recognize(image, cfg)
+            ocr_ms = (time.perf_counter() - start) * 1000
+            if best is None or pre_ms + ocr_ms < best[1] + best[2]:
+                fields = _extract_idcard_fields('\n'.join(lines))
+                best = (shape[0] * shape[1], pre_ms, ocr_ms, fields, info.get('cropped', False))
+        results[os.path.basename(path)] = best
+    return results
+
+
+def accuracy(results, reference):
+    """Share of reference fields (non-empty) that the variant read identically."""
+    total = correct = 0
+    for name, expected in reference.items():
+        if name not in results:
+            continue
+        fields = results[name][3]
+        for key in FIELDS:
+            if expected.get(key):
+                total += 1
+                correct += (fields.get(key) or '') == expected[key]
+    return correct / total if total else None
+
+
+def p95(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 图片预处理配置的耗时与字段准确率对比")
+    parser.add_argument("images", help="身份证照片目录")
+    parser.add_argument("--labels", help="标注文件（JSON：文件名 -> 期望字段）；缺省时以原图识别结果为参照")
+    parser.add_argument("--repeat", type=int, default=1, help="每张图片重复次数，取最快一次")
+    args = parser.parse_args()
+
+    if not ocr_engine.PADDLE_OCR_AVAILABLE or not ocr_preprocess.CV2_AVAILABLE:
+        sys.exit("需要安装 paddleocr 与 opencv-python-headless")
+    paths = sorted(
+        os.path.join(args.images, f) for f in os.listdir(args.images) if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    unreadable = [p for p in paths if ocr_preprocess.read_image(p, {}) is None]
+    if unreadable:
+        print(f"跳过无法解码的图片: {', '.join(os.path.basename(p) for p in unreadable)}")
+        paths = [p for p in paths if p not in unreadable]
+    if not paths:
+        sys.exit(f"{args.images} 中没有图片")
+    labels = None
+    if args.labels:
+        with open(args.labels, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+
+    base = ocr_engine.load_config()
+    base.pop('preprocess', None)
+    # 预热：模型加载与首次推理不计入耗时
+    ocr_engine.registry.recognize(ocr_preprocess.read_image(paths[0], {}), base)
+
+    print(f"images={len(paths)} repeat={args.repeat} reference={'labels' if labels else 'original'}")
+    print(f"{'variant':<22}{'MP':>6}{'pre ms':>8}{'ocr ms':>8}{'p95 ms':>8}{'cropped':>9}{'fields':>8}")
+    reference = labels
+    for name, pcfg in VARIANTS:
+        cfg = dict(base, preprocess={**ocr_engine.DEFAULT_CONFIG['preprocess'], 'crop_card': False, **pcfg})
+        results = run_variant(paths, cfg, args.repeat)
+        if reference is None:
+            reference = {k: v[3] for k, v in results.items()}
+        rows = list(results.values())
+        cropped = sum(1 for r in rows if r[4])
+        mp = sum(r[0] for r in rows) / len(rows) / 1e6
+        pre = sum(r[1] for r in rows) / len(rows)
+        ocr = sum(r[2] for r in rows) / len(rows)
+        acc = accuracy(results, reference)
+        print(
+            f"{name:<22}{mp:>6.1f}{pre:>8.0f}{ocr:>8.0f}{p95([r[1] + r[2] for r in rows]):>8.0f}"
+            f"{cropped:>6}/{len(paths):<2}{(f'{acc:.0%}' if acc is not None else '-'):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
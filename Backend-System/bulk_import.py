@@ -0,0 +1,532 @@
+"""Chunked import of rooms and tenants from CSV / XLSX files.
+
+An import is a row in ``import_jobs``. ``run_job`` reads the stored upload
+row by row (``read_rows``), validates each row in a generator
+(``validated_rows``) and writes ``chunk_size`` rows per transaction, so the
+write lock is released between chunks and ``processed_rows`` reports
+progress. Every row's outcome is kept in ``import_items``: the id of the
+record it created, or why it was rejected. A job that stopped part-way
+(error, worker restart) resumes after its last committed chunk, and
+``rollback_job`` deletes the records a job created. XLSX files need the
+optional ``openpyxl`` package.
+
+    python bulk_import.py rooms new_building.xlsx [--chunk-size 200]
+    python bulk_import.py --resume <job_id>
+    python bulk_import.py --rollback <job_id>
+"""
+import argparse
+import csv
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime
+from itertools import islice
+
+try:
+    import openpyxl
+except ImportError:  # 未安装 openpyxl 时只支持 CSV
+    openpyxl = None
+
+from common import IMPORT_DIR, connect
+from export_api import EXPORTS
+from occupancy import refresh_rooms
+from tenants_api import TENANT_INSERT, TENANT_REQUIRED_FIELDS, tenant_insert_params
+
+
+logger = logging.getLogger('bulk_import')
+
+DEFAULT_CHUNK_SIZE = 200
+MAX_CHUNK_SIZE = 5000
+
+# 执行中的任务超过该秒数未更新进度，视为进程已中断，可以继续或回滚
+STALE_AFTER = 300
+
+FILE_TYPES = ('.csv', '.xlsx')
+
+ROOM_HEADERS = {'building': '楼栋', 'floor': '楼层', 'room_no': '房号', 'room_type': '房型', 'price': '价格'}
+
+# 表头（字段名或中文名）-> 字段；租户沿用导出文件的中文表头，导出的文件可直接导入
+IMPORTS = {
+    'rooms': {
+        'label': '房间',
+        'headers': {**{v: k for k, v in ROOM_HEADERS.items()}, '房间号': 'room_no', '租金': 'price'},
+        'required': ['room_no', 'floor', 'room_type', 'price'],
+        'key': 'room_no',
+    },
+    'tenants': {
+        'label': '租户',
+        'headers': {v: k for k, v in EXPORTS['tenants']['headers'].items()},
+        'required': TENANT_REQUIRED_FIELDS,
+        'key': 'id_card',
+    },
+}
+
+_JOB_COLUMNS = [
+    'id', 'entity', 'filename', 'status', 'chunk_size', 'total_rows', 'processed_rows',
+    'inserted_rows', 'error_rows', 'error', 'created_by', 'created_at', 'updated_at',
+]
+
+
+class ImportJobError(ValueError):
+    """Raised for an unusable import file or a job in the wrong state."""
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # Excel 中的整数单元格读出为浮点数
+        return str(int(value))
+    return str(value).strip()
+
+
+def _csv_value(value):
+    value = value.strip()
+    # 导出文件把身份证号、手机号写成 ="..." 以免 Excel 转为数字，这里还原
+    if value.startswith('="') and value.endswith('"') and len(value) >= 3:
+        return value[2:-1].replace('""', '"')
+    return value
+
+
+def _raw_rows(path):
+    if path.lower().endswith('.xlsx'):
+        if openpyxl is None:
+            raise ImportJobError('未安装 openpyxl，无法读取 xlsx 文件，请另存为 CSV 后导入')
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for values in workbook.active.iter_rows(values_only=True):
+                yield [_cell(v) for v in values]
+        finally:
+            workbook.close()
+    else:
+        # utf-8-sig 兼容 Excel 另存的带 BOM 的 CSV
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for values in csv.reader(f):
+                yield [_csv_value(v) for v in values]
+
+
+def read_rows(path, entity):
+    """Yield ``(row_no, {field: value})`` for each data row; ``row_no`` starts at 1 below the header."""
+    spec = IMPORTS[entity]
+    rows = _raw_rows(path)
+    header = next(rows, None)
+    if not header:
+        raise ImportJobError('文件为空')
+    fields = [spec['headers'].get(h, h) for h in header]
+    missing = [k for k in spec['required'] if k not in fields]
+    if missing:
+        raise ImportJobError(f"缺少必要的列: {', '.join(missing)}")
+    for row_no, values in enumerate(rows, start=1):
+        yield row_no, {k: v for k, v in zip(fields, values) if k}
+
+
+def validated_rows(entity, rows):
+    """Yield ``(row_no, record, error)``; blank rows are skipped, duplicates within the file rejected."""
+    spec = IMPORTS[entity]
+    key = spec['key']
+    seen = {}
+    for row_no, row in rows:
+        if not any(row.values()):
+            continue
+        missing = [k for k in spec['required'] if not row.get(k)]
+        if missing:
+            yield row_no, None, f"缺少必要参数: {', '.join(missing)}"
+            continue
+        if row[key] in seen:
+            yield row_no, None, f"与第 {seen[row[key]]} 行重复"
+            continue
+        if entity == 'rooms':
+            try:
+                row['floor'] = int(row['floor'])
+                row['price'] = float(row['price'])
+            except ValueError:
+                yield row_no, None, '楼层须为整数，价格须为数字'
+                continue
+        seen[row[key]] = row_no
+        yield row_no, row, None
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _in(values):
+    return f"({', '.join('?' for _ in values)})"
+
+
+def _write_chunk(cursor, entity, chunk):
+    """Insert the valid rows of ``chunk``; returns ``(row_no, status, entity_id, message)`` per row."""
+    key = IMPORTS[entity]['key']
+    items = [(row_no, 'error', None, error) for row_no, row, error in chunk if error]
+    valid = [(row_no, row) for row_no, row, error in chunk if not error]
+    if not valid:
+        return items
+
+    table = 'rooms' if entity == 'rooms' else 'tenants'
+    keys = [row[key] for _, row in valid]
+    cursor.execute(f"SELECT {key} FROM {table} WHERE {key} IN {_in(keys)}", keys)
+    existing = {r[0] for r in cursor.fetchall()}
+    rooms = {}
+    if entity == 'tenants':
+        room_nos = sorted({row['room_no'] for _, row in valid})
+        cursor.execute(f"SELECT room_no, id FROM rooms WHERE room_no IN {_in(room_nos)}", room_nos)
+        rooms = dict(cursor.fetchall())
+
+    rows = []
+    for row_no, row in valid:
+        if row[key] in existing:
+            items.append((row_no, 'error', None, f"{'房号' if entity == 'rooms' else '身份证号'} {row[key]} 已存在"))
+        elif entity == 'tenants' and row['room_no'] not in rooms:
+            items.append((row_no, 'error', None, f"房间 {row['room_no']} 不存在"))
+        else:
+            rows.append((row_no, row))
+    if not rows:
+        return items
+
+    if entity == 'rooms':
+        cursor.executemany(
+            "INSERT INTO rooms (room_no, floor, room_type, price, building) VALUES (?, ?, ?, ?, ?)",
+            [(r['room_no'], r['floor'], r['room_type'], r['price'], r.get('building', '')) for _, r in rows],
+        )
+    else:
+        cursor.executemany(TENANT_INSERT, [tenant_insert_params(r, rooms[r['room_no']]) for _, r in rows])
+        refresh_rooms(cursor, {rooms[r['room_no']] for _, r in rows})
+    keys = [r[key] for _, r in rows]
+    cursor.execute(f"SELECT {key}, id FROM {table} WHERE {key} IN {_in(keys)}", keys)
+    ids = dict(cursor.fetchall())
+    items.extend((row_no, 'inserted', ids.get(r[key]), None) for row_no, r in rows)
+    return items
+
+
+def get_job(conn, job_id):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM import_jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+
+def list_jobs(conn, limit=20):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM import_jobs ORDER BY id DESC LIMIT ?", (limit,))
+    return [dict(zip(_JOB_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def job_errors(conn, job_id, limit=100):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT row_no, message FROM import_items WHERE job_id = ? AND status IN ('error', 'kept')"
+        " ORDER BY row_no LIMIT ?",
+        (job_id, limit),
+    )
+    return [{'row': r[0], 'message': r[1]} for r in cursor.fetchall()]
+
+
+def _source_path(conn, job_id):
+    row = conn.execute("SELECT source_path FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _remove_source(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def create_job(entity, filename, save, chunk_size=DEFAULT_CHUNK_SIZE, created_by=None, conn=None):
+    """Register an import of ``entity``; ``save(path)`` writes the uploaded file. Returns the job."""
+    if entity not in IMPORTS:
+        raise ImportJobError(f"不支持的导入类型 {entity}，可选: {', '.join(IMPORTS)}")
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in FILE_TYPES:
+        raise ImportJobError(f"仅支持 {', '.join(FILE_TYPES)} 文件")
+    chunk_size = max(1, min(int(chunk_size), MAX_CHUNK_SIZE))
+
+    own = conn is None
+    conn = conn or connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO import_jobs (entity, filename, source_path, chunk_size, created_by) VALUES (?, ?, '', ?, ?)",
+            (entity, filename, chunk_size, created_by),
+        )
+        job_id = cursor.lastrowid
+        conn.commit()
+
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        path = os.path.join(IMPORT_DIR, f"{job_id}{ext}")
+        try:
+            save(path)
+            # 预先数一遍行数，用于进度显示；同时校验表头
+            total = sum(1 for _ in read_rows(path, entity))
+        except Exception:
+            _remove_source(path)
+            conn.execute("DELETE FROM import_jobs WHERE id = ?", (job_id,))
+            conn.commit()
+            raise
+        cursor.execute(
+            "UPDATE import_jobs SET source_path = ?, total_rows = ? WHERE id = ?",
+            (path, total, job_id),
+        )
+        conn.commit()
+        return get_job(conn, job_id)
+    finally:
+        if own:
+            conn.close()
+
+
+def _claim(conn, job_id, status, allowed):
+    """Move the job to ``status`` if it is in one of ``allowed`` states or stalled; True on success."""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        UPDATE import_jobs SET status = ?, error = NULL, updated_at = datetime('now')
+        WHERE id = ? AND (status IN {_in(allowed)}
+                          OR (status IN ('running', 'rolling_back') AND updated_at < datetime('now', ?)))
+        """,
+        (status, job_id, *allowed, f'-{STALE_AFTER} seconds'),
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def claim_job(job_id, conn=None):
+    """Mark a pending, failed or stalled job as running; raises ``ImportJobError`` otherwise."""
+    own = conn is None
+    conn = conn or connect()
+    try:
+        if _claim(conn, job_id, 'running', ('pending', 'failed')):
+            return
+        job = get_job(conn, job_id)
+    finally:
+        if own:
+            conn.close()
+    if job is None:
+        raise ImportJobError(f'导入任务 {job_id} 不存在')
+    raise ImportJobError(f"导入任务 {job_id} 当前状态为 {job['status']}，无法执行")
+
+
+def run_job(job_id, conn=None):
+    """Import the rows of a claimed job not yet committed, one transaction per chunk. Returns the job."""
+    own = conn is None
+    conn = conn or connect()
+    try:
+        job = get_job(conn, job_id)
+        path = _source_path(conn, job_id)
+        entity = job['entity']
+        cursor = conn.cursor()
+        try:
+            # 继续执行时跳过已提交的行
+            rows = (r for r in read_rows(path, entity) if r[0] > job['processed_rows'])
+            for chunk in _chunks(validated_rows(entity, rows), job['chunk_size']):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    items = _write_chunk(cursor, entity, chunk)
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO import_items (job_id, row_no, status, entity_id, message)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        [(job_id, *item) for item in items],
+                    )
+                    inserted = sum(1 for item in items if item[1] == 'inserted')
+                    cursor.execute(
+                        """
+                        UPDATE import_jobs
+                        SET processed_rows = ?, inserted_rows = inserted_rows + ?, error_rows = error_rows + ?,
+                            updated_at = datetime('now')
+                        WHERE id = ?
+                        """,
+                        (chunk[-1][0], inserted, len(items) - inserted, job_id),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            cursor.execute(
+                """
+                UPDATE import_jobs SET status = 'completed', processed_rows = total_rows, updated_at = datetime('now')
+                WHERE id = ?
+                """,
+                (job_id,),
+            )
+            conn.commit()
+            # 导入完成后不再需要原始文件（回滚只依赖 import_items）
+            _remove_source(path)
+        except Exception as e:
+            logger.error(f"导入任务 {job_id} 失败: {e}")
+            cursor.execute(
+                "UPDATE import_jobs SET status = 'failed', error = ?, updated_at = datetime('now') WHERE id = ?",
+                (str(e), job_id),
+            )
+            conn.commit()
+        job = get_job(conn, job_id)
+        logger.info(
+            "导入任务 %s %s：写入 %s 行，错误 %s 行", job_id, job['status'], job['inserted_rows'], job['error_rows']
+        )
+        return job
+    finally:
+        if own:
+            conn.close()
+
+
+def start_job(job_id):
+    """Claim the job and run it on a background thread; progress is read from ``import_jobs``."""
+    claim_job(job_id)
+    thread = threading.Thread(target=run_job, args=(job_id,), name=f'import-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def _rollback_chunk(cursor, entity, items):
+    """Delete the records created for ``items`` (``(row_no, entity_id)``); returns the row_nos kept."""
+    ids = [entity_id for _, entity_id in items]
+    kept = set()
+    if entity == 'rooms':
+        # 已有租户、搬迁或维修记录引用的房间保留
+        cursor.execute(
+            f"""
+            SELECT id FROM rooms r WHERE id IN {_in(ids)} AND (
+                EXISTS (SELECT 1 FROM tenants t WHERE t.room_id = r.id)
+                OR EXISTS (SELECT 1 FROM tenant_moves m WHERE m.old_room_id = r.id OR m.new_room_id = r.id)
+                OR EXISTS (SELECT 1 FROM repair_records rr WHERE rr.room_no = r.room_no)
+            )
+            """,
+            ids,
+        )
+        used = {r[0] for r in cursor.fetchall()}
+        kept = {row_no for row_no, entity_id in items if entity_id in used}
+        unused = [i for i in ids if i not in used]
+        if unused:
+            cursor.execute(f"DELETE FROM rooms WHERE id IN {_in(unused)}", unused)
+    else:
+        cursor.execute(f"SELECT DISTINCT room_id FROM tenants WHERE id IN {_in(ids)}", ids)
+        room_ids = [r[0] for r in cursor.fetchall()]
+        cursor.execute(f"DELETE FROM tenant_moves WHERE tenant_id IN {_in(ids)}", ids)
+        cursor.execute(f"DELETE FROM tenants WHERE id IN {_in(ids)}", ids)
+        refresh_rooms(cursor, room_ids)
+    return kept
+
+
+def rollback_job(job_id, conn=None):
+    """Delete the records a finished or failed job created, one chunk per transaction.
+
+    Returns ``(deleted, kept)``; rooms already referenced by tenants, moves or
+    repair records are kept.
+    """
+    own = conn is None
+    conn = conn or connect()
+    try:
+        job = get_job(conn, job_id)
+        if job is None:
+            raise ImportJobError(f'导入任务 {job_id} 不存在')
+        if not _claim(conn, job_id, 'rolling_back', ('completed', 'failed')):
+            raise ImportJobError(f"导入任务 {job_id} 当前状态为 {job['status']}，无法回滚")
+
+        deleted = kept = 0
+        cursor = conn.cursor()
+        try:
+            while True:
+                cursor.execute(
+                    "SELECT row_no, entity_id FROM import_items WHERE job_id = ? AND status = 'inserted'"
+                    " ORDER BY row_no LIMIT ?",
+                    (job_id, job['chunk_size']),
+                )
+                items = cursor.fetchall()
+                if not items:
+                    break
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    kept_rows = _rollback_chunk(cursor, job['entity'], items)
+                    cursor.executemany(
+                        "UPDATE import_items SET status = ?, message = ? WHERE job_id = ? AND row_no = ?",
+                        [
+                            ('kept', '已被其他记录引用，未删除', job_id, row_no) if row_no in kept_rows
+                            else ('rolled_back', None, job_id, row_no)
+                            for row_no, _ in items
+                        ],
+                    )
+                    cursor.execute("UPDATE import_jobs SET updated_at = datetime('now') WHERE id = ?", (job_id,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                deleted += len(items) - len(kept_rows)
+                kept += len(kept_rows)
+        except Exception as e:
+            cursor.execute(
+                "UPDATE import_jobs SET status = 'failed', error = ?, updated_at = datetime('now') WHERE id = ?",
+                (f'回滚失败: {e}', job_id),
+            )
+            conn.commit()
+            raise
+
+        cursor.execute(
+            "UPDATE import_jobs SET status = 'rolled_back', updated_at = datetime('now') WHERE id = ?", (job_id,)
+        )
+        conn.commit()
+        path = _source_path(conn, job_id)
+        if path:
+            _remove_source(path)
+        logger.info("导入任务 %s 已回滚：删除 %s 条，保留 %s 条", job_id, deleted, kept)
+        return deleted, kept
+    finally:
+        if own:
+            conn.close()
+
+
+def _print_job(job):
+    print(
+        f"任务 {job['id']}（{IMPORTS[job['entity']]['label']}）{job['status']}："
+        f"{job['processed_rows']}/{job['total_rows']} 行，写入 {job['inserted_rows']}，错误 {job['error_rows']}"
+    )
+    if job['error']:
+        print(f"错误: {job['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 CSV / XLSX 文件分批导入房间或租户")
+    parser.add_argument("entity", nargs="?", choices=list(IMPORTS), help="导入类型")
+    parser.add_argument("file", nargs="?", help="CSV 或 XLSX 文件")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每个事务写入的行数")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="继续执行中断或失败的导入任务")
+    parser.add_argument("--rollback", type=int, metavar="JOB_ID", help="删除导入任务写入的记录")
+    args = parser.parse_args()
+
+    try:
+        if args.rollback:
+            deleted, kept = rollback_job(args.rollback)
+            print(f"✅ 已回滚：删除 {deleted} 条，保留 {kept} 条（已被引用）")
+            return
+        if args.resume:
+            job_id = args.resume
+        elif args.entity and args.file:
+            source = args.file
+            job = create_job(args.entity, os.path.basename(source), lambda path: shutil.copyfile(source, path),
+                             args.chunk_size, created_by='cli')
+            job_id = job['id']
+        else:
+            parser.error("请指定导入类型与文件，或使用 --resume / --rollback")
+        claim_job(job_id)
+        conn = connect()
+        try:
+            _print_job(run_job(job_id, conn))
+            for e in job_errors(conn, job_id, limit=20):
+                print(f"  第 {e['row']} 行: {e['message']}")
+        finally:
+            conn.close()
+    except ImportJobError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
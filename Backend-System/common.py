@@ -1,5 +1,13 @@
 import os
 import sqlite3
+import threading
+
+try:
+    from flask import has_app_context
+except ImportError:
+    # init-scripts may run under an interpreter without Flask; they never pool
+    def has_app_context():
+        return False
 
 # Base directory for resolving paths
 BASE_DIR = os.path.dirname(__file__)
@@ -7,12 +15,46 @@ BASE_DIR = os.path.dirname(__file__)
 # Shared database path (moved into sql folder)
 DB_NAME = os.path.join(BASE_DIR, "sql", "hotel.db")
 
+# Cache database shared by all worker processes (disposable, rebuilt on demand)
+CACHE_DB_NAME = os.path.join(BASE_DIR, "sql", "cache.db")
 
-def connect():
-    """Create a SQLite connection with foreign keys enabled."""
+# Uploaded import files, kept until the import job is finished (needed to resume)
+IMPORT_DIR = os.path.join(BASE_DIR, "sql", "imports")
+
+# Request body limits: whole app (import files) and OCR image uploads
+MAX_CONTENT_LENGTH = 32 * 1024 * 1024
+OCR_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+CACHED_STATEMENTS = 512
+
+# One pooled connection per worker thread, reused across requests
+_local = threading.local()
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection owned by a worker thread and reused across requests.
+
+    Handlers still call ``conn.close()`` when they are done; for a pooled
+    connection that is a no-op, so the connection (and its statement cache)
+    stays open for the next request. A nested ``connect()`` ... ``close()``
+    in the same request gets this same object, so closing must not touch
+    the outer handler's transaction: an unfinished one is rolled back only
+    by ``release_connection`` when the app context ends.
+    """
+
+    def close(self):
+        pass
+
+    def dispose(self):
+        """Really close the underlying connection."""
+        super().close()
+
+
+def _open(factory=sqlite3.Connection):
     # Ensure the sql directory exists before connecting
     os.makedirs(os.path.dirname(DB_NAME), exist_ok=True)
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(DB_NAME, factory=factory, cached_statements=CACHED_STATEMENTS)
     # Enable foreign keys, WAL mode and a reasonable busy timeout to reduce 'database is locked'
     conn.execute("PRAGMA foreign_keys = ON")
     try:
@@ -24,6 +66,48 @@ def connect():
     return conn
 
 
+def connect():
+    """Return a SQLite connection with foreign keys enabled.
+
+    Inside a Flask app context the calling thread's pooled connection is
+    returned (opened and configured on first use). Scripts running outside
+    an app context get a fresh connection that they close themselves.
+    """
+    if not has_app_context():
+        return _open()
+    conn = getattr(_local, "conn", None)
+    # A connection inherited across fork (gunicorn --preload) must not be reused
+    if conn is None or _local.pid != os.getpid():
+        conn = _open(PooledConnection)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def release_connection(exc=None):
+    """App-context teardown: end any transaction left open on this thread's connection."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        # Broken connection: drop it so the next request opens a new one
+        try:
+            conn.dispose()
+        except Exception:
+            pass
+        _local.conn = None
+
+
+def init_app(app):
+    """Bind the per-thread connection pool to the app context lifecycle."""
+    app.teardown_appcontext(release_connection)
+
+
 # Authentication constants (keep consistent with existing modules)
 SECRET_KEY = 'homes_rental_secret_key'
-JWT_EXPIRATION_DELTA = 30 * 60  # 30 minutes, sliding expiration window
\ No newline at end of file
+JWT_EXPIRATION_DELTA = 30 * 60  # 30 minutes, sliding expiration window
+TOKEN_REFRESH_THRESHOLD = 10 * 60  # re-issue the token only when less than this remains
+ADMIN_CACHE_TTL = 15  # seconds an authenticated admin record is reused without a query (bounds cross-worker staleness)
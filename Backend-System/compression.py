@@ -0,0 +1,158 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+``init_app`` installs an ``after_request`` hook that compresses text and JSON
+responses with brotli (when the optional ``brotli`` package is installed) or
+gzip. Buffered bodies below ``COMPRESS_MIN_SIZE`` bytes are sent as is;
+streamed bodies (``stream=1``, exports) are compressed chunk by chunk and
+flushed after every chunk, so they still arrive incrementally. Levels come
+from ``COMPRESS_LEVEL`` (gzip, 1-9) and ``COMPRESS_BROTLI_QUALITY`` (0-11).
+"""
+import threading
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只使用 gzip
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+}
+
+
+class CompressionStats:
+    """Per-encoding counts of compressed responses and bytes before/after."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings = {}
+        self.skipped_small = 0
+
+    def record(self, encoding, raw, compressed):
+        with self._lock:
+            entry = self._encodings.setdefault(encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0})
+            entry['responses'] += 1
+            entry['bytes_in'] += raw
+            entry['bytes_out'] += compressed
+
+    def skip_small(self):
+        with self._lock:
+            self.skipped_small += 1
+
+    def stats(self):
+        with self._lock:
+            result = {'skipped_small': self.skipped_small}
+            for encoding, entry in self._encodings.items():
+                ratio = entry['bytes_in'] / entry['bytes_out'] if entry['bytes_out'] else None
+                result[encoding] = dict(entry, ratio=round(ratio, 2) if ratio else None)
+            return result
+
+
+stats = CompressionStats()
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits=31：带 gzip 头尾的 deflate 流
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+def _choose_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def _stream(chunks, compressor, encoding):
+    raw = compressed = 0
+    try:
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            raw += len(data)
+            out = compressor.chunk(data)
+            compressed += len(out)
+            yield out
+        out = compressor.finish()
+        compressed += len(out)
+        yield out
+        stats.record(encoding, raw, compressed)
+    finally:
+        # 关闭原始生成器，使其中的 finally（归还数据库连接）得以执行
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def init_app(app):
+    min_size = app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    level = app.config.setdefault('COMPRESS_LEVEL', 6)
+    quality = app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+
+    def make_compressor(encoding):
+        return _Brotli(quality) if encoding == 'br' else _Gzip(level)
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code == 304:
+            # 304 沿用原响应的 Vary，缓存才能按编码区分
+            response.vary.add('Accept-Encoding')
+            return response
+        if (response.status_code < 200 or response.status_code == 204
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or not _is_compressible(response)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, make_compressor(encoding), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                stats.skip_small()
+                return response
+            compressor = make_compressor(encoding)
+            body = compressor.chunk(data) + compressor.finish()
+            stats.record(encoding, len(data), len(body))
+            response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # 压缩后字节不同，强 ETag 降为弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,99 @@
+"""Full-text index over the contract archive (``contracts_fts``).
+
+The index stores the plain text extracted from ``rendered_html`` plus
+``tenant_name``, ``room_no`` and ``id_card``, keyed by contract id. Contract
+write paths call ``index_contract``; deletes are handled by a trigger.
+"""
+import html
+import re
+from html.parser import HTMLParser
+
+
+# 这些标签前后插入空白，避免相邻段落的文字粘连
+_BLOCK_TAGS = {
+    'p', 'div', 'br', 'li', 'tr', 'td', 'th', 'table', 'section', 'article',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+}
+
+# snippet() 的高亮标记；转义文本后再替换为 <mark>
+_HL_OPEN, _HL_CLOSE = '\x02', '\x03'
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(markup):
+    """Plain text of a rendered contract, whitespace collapsed."""
+    if not markup:
+        return ''
+    parser = _TextExtractor()
+    parser.feed(markup)
+    parser.close()
+    return re.sub(r'\s+', ' ', ''.join(parser.parts)).strip()
+
+
+def index_contract(cursor, contract_id, rendered_html, tenant_name, room_no, id_card):
+    """(Re)index one contract from the values just written. Does not commit."""
+    cursor.execute("DELETE FROM contracts_fts WHERE rowid = ?", (contract_id,))
+    cursor.execute(
+        "INSERT INTO contracts_fts (rowid, body, tenant_name, room_no, id_card) VALUES (?, ?, ?, ?, ?)",
+        (contract_id, html_to_text(rendered_html), tenant_name, room_no, id_card),
+    )
+
+
+def reindex_contracts(cursor, batch_size=200):
+    """Rebuild the whole index from the contracts table. Does not commit."""
+    cursor.execute("DELETE FROM contracts_fts")
+    rows = cursor.connection.execute(
+        "SELECT id, rendered_html, tenant_name, room_no, id_card FROM contracts"
+    )
+    while True:
+        batch = rows.fetchmany(batch_size)
+        if not batch:
+            break
+        cursor.executemany(
+            "INSERT INTO contracts_fts (rowid, body, tenant_name, room_no, id_card) VALUES (?, ?, ?, ?, ?)",
+            [(r[0], html_to_text(r[1]), r[2], r[3], r[4]) for r in batch],
+        )
+
+
+def snippet_sql(tokens=40):
+    """SQL for a best-column snippet with highlight markers (see ``render_snippet``)."""
+    return f"snippet(contracts_fts, -1, '{_HL_OPEN}', '{_HL_CLOSE}', '…', {int(tokens)})"
+
+
+def excerpt(text, terms, width=40):
+    """Snippet for LIKE-only searches (no MATCH, so ``snippet()`` is unavailable)."""
+    text = text or ''
+    hits = [text.find(t) for t in terms if t in text]
+    start = max(0, min(hits) - width) if hits else 0
+    end = start + 2 * width
+    raw = text[start:end]
+    for term in sorted(set(terms), key=len, reverse=True):
+        raw = raw.replace(term, _HL_OPEN + term + _HL_CLOSE)
+    return ('…' if start > 0 else '') + raw + ('…' if end < len(text) else '')
+
+
+def render_snippet(raw):
+    """Escape snippet text for HTML and turn the markers into ``<mark>`` tags."""
+    return html.escape(raw or '').replace(_HL_OPEN, '<mark>').replace(_HL_CLOSE, '</mark>')
@@ -1,112 +1,64 @@
 import sqlite3
 from flask import Blueprint, request, jsonify
-import jwt
-from functools import wraps
+from auth_api import token_required
 from common import connect
-
-
-def ensure_contract_templates_schema():
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS contract_templates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            content_html TEXT NOT NULL,
-            created_at DATETIME DEFAULT (DATETIME('now')),
-            updated_at DATETIME DEFAULT (DATETIME('now'))
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
+from conditional import conditional_get
+from response_cache import cached, invalidates
+from listing import FieldSet, ListQueryError
 
 
 templates_bp = Blueprint("contract_templates", __name__, url_prefix="/api/contract-templates")
 
+_TEMPLATE_COLUMNS = [
+    ("id", "id"), ("name", "name"), ("description", "description"),
+    ("created_at", "created_at"), ("updated_at", "updated_at"),
+]
 
-def token_required_bp(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-        if not token:
-            return jsonify({"error": "缺少认证令牌"}), 401
-        try:
-            data = jwt.decode(token, "homes_rental_secret_key", algorithms=["HS256"])  # 与主应用一致
-            conn = connect()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("SELECT * FROM admins WHERE username = ?", (data.get("username"),))
-            except sqlite3.OperationalError as e:
-                # 友好提示数据库未初始化或路径不一致
-                conn.close()
-                return jsonify({"error": f"数据库未初始化或不可用：{e}"}), 500
-            user_data = cursor.fetchone()
-            conn.close()
-            if not user_data:
-                return jsonify({"error": "无效的认证令牌"}), 401
-            current_user = {
-                "id": user_data[0],
-                "username": user_data[1],
-                "full_name": user_data[3],
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "认证令牌已过期，请重新登录"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "无效的认证令牌"}), 401
-        return f(current_user=current_user, *args, **kwargs)
-    return decorated
+TEMPLATE_FIELDS = FieldSet(_TEMPLATE_COLUMNS)
+
+TEMPLATE_DETAIL_FIELDS = FieldSet(_TEMPLATE_COLUMNS + [("content_html", "content_html")])
 
 
 @templates_bp.route("", methods=["GET"])
-@token_required_bp
+@token_required
+@conditional_get("contract_templates")
+@cached("contract_templates")
 def list_templates(current_user):
+    try:
+        projection = TEMPLATE_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
     conn = connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, description, created_at, updated_at FROM contract_templates ORDER BY updated_at DESC")
+    cursor.execute("SELECT " + projection.sql + " FROM contract_templates ORDER BY updated_at DESC")
     rows = cursor.fetchall()
     conn.close()
-    templates = [
-        {
-            "id": r[0],
-            "name": r[1],
-            "description": r[2],
-            "created_at": r[3],
-            "updated_at": r[4],
-        }
-        for r in rows
-    ]
+    templates = [projection.record(r) for r in rows]
     return jsonify({"templates": templates})
 
 
 @templates_bp.route("/<int:tid>", methods=["GET"])
-@token_required_bp
+@token_required
+@conditional_get("contract_templates")
+@cached("contract_templates")
 def get_template(current_user, tid: int):
+    try:
+        projection = TEMPLATE_DETAIL_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({"error": str(e)}), 400
     conn = connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, description, content_html, created_at, updated_at FROM contract_templates WHERE id = ?", (tid,))
+    cursor.execute("SELECT " + projection.sql + " FROM contract_templates WHERE id = ?", (tid,))
     row = cursor.fetchone()
     conn.close()
     if not row:
         return jsonify({"error": "模板不存在"}), 404
-    tpl = {
-        "id": row[0],
-        "name": row[1],
-        "description": row[2],
-        "content_html": row[3],
-        "created_at": row[4],
-        "updated_at": row[5],
-    }
-    return jsonify({"template": tpl})
+    return jsonify({"template": projection.record(row)})
 
 
 @templates_bp.route("", methods=["POST"])
-@token_required_bp
+@token_required
+@invalidates("contract_templates")
 def add_template(current_user):
     data = request.json or {}
     name = data.get("name")
@@ -127,7 +79,8 @@ def add_template(current_user):
 
 
 @templates_bp.route("/<int:tid>", methods=["PUT"])
-@token_required_bp
+@token_required
+@invalidates("contract_templates")
 def update_template(current_user, tid: int):
     data = request.json or {}
     allowed = {"name", "description", "content_html"}
@@ -148,7 +101,8 @@ def update_template(current_user, tid: int):
 
 
 @templates_bp.route("/<int:tid>", methods=["DELETE"])
-@token_required_bp
+@token_required
+@invalidates("contract_templates", "contracts")
 def delete_template(current_user, tid: int):
     """删除模板时总是连同删除关联合同。"""
     conn = connect()
@@ -191,7 +145,7 @@ def delete_template(current_user, tid: int):
 
 
 @templates_bp.route("/<int:tid>/render", methods=["POST"])
-@token_required_bp
+@token_required
 def render_template(current_user, tid: int):
     """使用传入的数据渲染模板：占位符语法 {{key}}"""
     data = request.json or {}
@@ -4,54 +4,45 @@ import datetime
 import jwt
 
 from common import connect, SECRET_KEY
-
-
-def ensure_contracts_schema():
-    conn = connect()
-    cur = conn.cursor()
-    # Create table if missing (with complete schema)
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS contracts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_id INTEGER,
-            template_id INTEGER,
-            tenant_name TEXT,
-            id_card TEXT,
-            room_no TEXT,
-            start_date TEXT,
-            end_date TEXT,
-            rent REAL,
-            rendered_html TEXT,
-            created_at TEXT,
-            updated_at TEXT
-        )
-        """
-    )
-    # Ensure required columns exist for older schemas
-    cur.execute("PRAGMA table_info(contracts)")
-    existing_cols = {row[1] for row in cur.fetchall()}
-    def add_col(name: str, type_def: str):
-        if name not in existing_cols:
-            cur.execute(f"ALTER TABLE contracts ADD COLUMN {name} {type_def}")
-    add_col("room_id", "INTEGER")
-    add_col("tenant_id", "INTEGER")
-    add_col("template_id", "INTEGER")
-    add_col("tenant_name", "TEXT")
-    add_col("id_card", "TEXT")
-    add_col("room_no", "TEXT")
-    add_col("start_date", "TEXT")
-    add_col("end_date", "TEXT")
-    add_col("rent", "REAL")
-    add_col("rendered_html", "TEXT")
-    add_col("created_at", "TEXT")
-    add_col("updated_at", "TEXT")
-    conn.commit()
-    conn.close()
+from conditional import conditional_get
+from response_cache import invalidates
+from streaming import stream_page
+from contract_search import excerpt, index_contract, render_snippet, snippet_sql
+from listing import (
+    FieldSet, Filters, ListQueryError, fts_match, like_contains, limit_clause, order_by, page_rows,
+    parse_flag, parse_limit, split_search_terms,
+)
 
 
 contracts_bp = Blueprint("contracts", __name__, url_prefix="/api/contracts")
 
+_CONTRACT_COLUMNS = [
+    ("id", "id"), ("template_id", "template_id"), ("tenant_id", "tenant_id"), ("room_id", "room_id"),
+    ("tenant_name", "tenant_name"), ("id_card", "id_card"), ("room_no", "room_no"),
+    ("start_date", "start_date"), ("end_date", "end_date"), ("rent", "rent"),
+    ("created_at", "created_at"), ("updated_at", "updated_at"),
+]
+
+# 列表不提供 rendered_html；详情可用 fields= 省略正文
+CONTRACT_FIELDS = FieldSet(
+    _CONTRACT_COLUMNS,
+    default=["id", "template_id", "tenant_name", "room_no", "start_date", "end_date", "rent", "created_at"],
+    required=["id"],
+)
+
+# 检索结果始终附带 snippet 高亮片段
+CONTRACT_SEARCH_FIELDS = FieldSet([
+    ("id", "f.rowid"), ("template_id", "c.template_id"), ("tenant_name", "f.tenant_name"),
+    ("room_no", "f.room_no"), ("id_card", "f.id_card"), ("start_date", "c.start_date"),
+    ("end_date", "c.end_date"), ("rent", "c.rent"),
+])
+
+CONTRACT_DETAIL_FIELDS = FieldSet(
+    _CONTRACT_COLUMNS + [("rendered_html", "rendered_html")],
+    default=["id", "template_id", "tenant_name", "id_card", "room_no", "start_date", "end_date", "rent",
+             "rendered_html", "created_at"],
+)
+
 
 @contracts_bp.before_request
 def require_token():
@@ -70,6 +61,7 @@ def require_token():
 
 
 @contracts_bp.route("", methods=["POST"])  # POST /api/contracts
+@invalidates("contracts")
 def create_contract():
     payload = request.get_json(force=True) or {}
     template_id = payload.get("template_id")
@@ -206,77 +198,150 @@ def create_contract():
             rendered,
         ),
     )
-    conn.commit()
     new_id = cur.lastrowid
+    index_contract(cur, new_id, rendered, tenant_name, room_no, id_card)
+    conn.commit()
     conn.close()
 
     return jsonify({"id": new_id, "message": "Contract saved", "template_name": template_name}), 201
 
 
+def contract_filters(args):
+    """合同档案的筛选条件（列表接口与导出共用）"""
+    filters = Filters()
+    filters.equal("template_id", args.get("template_id"))
+    filters.equal("tenant_id", args.get("tenant_id"))
+    filters.equal("room_no", args.get("room_no"))
+    filters.equal("id_card", args.get("id_card"))
+    filters.date_range("start_date", args.get("date_from"), args.get("date_to"))
+    return filters
+
+
 @contracts_bp.route("", methods=["GET"])  # GET /api/contracts
+@conditional_get("contracts")
 def list_contracts():
-    page = int(request.args.get("page", 1))
-    page_size = int(request.args.get("page_size", 10))
-    offset = (page - 1) * page_size
+    # 传入 limit/after/stream 时使用游标分页（total 需显式 include_total=1）；否则保持原有 page/page_size 分页
+    stream = parse_flag(request.args, "stream")
+    cursor_mode = stream or "limit" in request.args or "after" in request.args
+    try:
+        projection = CONTRACT_FIELDS.parse(request.args)
+        filters = contract_filters(request.args)
+        base_filters = filters.copy()
+        if cursor_mode:
+            # 流式输出不传 limit 时返回全部符合条件的合同
+            limit = parse_limit(request.args, default=None if stream else 10)
+            filters.after(["id"], request.args.get("after"), descending=True)
+            paging = limit_clause(limit)
+        else:
+            page = int(request.args.get("page", 1))
+            page_size = int(request.args.get("page_size", 10))
+            paging = f" LIMIT {page_size} OFFSET {(page - 1) * page_size}"
+    except (ListQueryError, ValueError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    def sort_key(r):
+        return [projection.value(r, "id")]
 
     conn = connect()
     cur = conn.cursor()
+    total = None
+    if not cursor_mode or parse_flag(request.args, "include_total"):
+        cur.execute("SELECT COUNT(*) FROM contracts" + base_filters.where(), base_filters.params)
+        total = cur.fetchone()[0]
     cur.execute(
-        "SELECT id, template_id, tenant_name, room_no, start_date, end_date, rent, created_at FROM contracts ORDER BY id DESC LIMIT ? OFFSET ?",
-        (page_size, offset),
+        "SELECT " + projection.sql + " FROM contracts"
+        + filters.where() + order_by(["id"], descending=True) + paging,
+        filters.params,
     )
+    if stream:
+        extra = {"total": total} if total is not None else None
+        return stream_page("items", conn, cur, projection.record, limit, sort_key, extra)
     rows = cur.fetchall()
-    cur.execute("SELECT COUNT(*) FROM contracts")
-    total = cur.fetchone()[0]
+    next_cursor = None
+    if cursor_mode:
+        rows, next_cursor = page_rows(rows, limit, sort_key)
     conn.close()
 
-    items = []
-    for r in rows:
-        items.append(
-            {
-                "id": r[0],
-                "template_id": r[1],
-                "tenant_name": r[2],
-                "room_no": r[3],
-                "start_date": r[4],
-                "end_date": r[5],
-                "rent": r[6],
-                "created_at": r[7],
-            }
-        )
+    items = [projection.record(r) for r in rows]
 
+    if cursor_mode:
+        result = {"items": items, "next_cursor": next_cursor}
+        if total is not None:
+            result["total"] = total
+        return jsonify(result)
     return jsonify({"items": items, "total": total, "page": page, "page_size": page_size})
 
 
-@contracts_bp.route("/<int:contract_id>", methods=["GET"])  # GET /api/contracts/:id
-def get_contract(contract_id: int):
+@contracts_bp.route("/search", methods=["GET"])  # GET /api/contracts/search?q=
+@conditional_get("contracts")
+def search_contracts():
+    """按合同正文、租户姓名、房号、身份证号检索合同档案，返回高亮片段而非完整 HTML"""
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"message": "缺少搜索关键词 q"}), 400
+    try:
+        limit = parse_limit(request.args, default=20, maximum=100)
+        projection = CONTRACT_SEARCH_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({"message": str(e)}), 400
+
+    fts_terms, short_terms = split_search_terms(q)
+    filters = Filters()
+    # 不足 3 个字符的关键词无法走 trigram 索引，改为在索引的纯文本上 LIKE 匹配
+    for term in short_terms:
+        pattern = like_contains(term)
+        filters.add(
+            "(f.body LIKE ? ESCAPE '\\' OR f.tenant_name LIKE ? ESCAPE '\\'"
+            " OR f.room_no LIKE ? ESCAPE '\\' OR f.id_card LIKE ? ESCAPE '\\')",
+            pattern, pattern, pattern, pattern,
+        )
+    if fts_terms:
+        filters.add("contracts_fts MATCH ?", fts_match(fts_terms))
+        snippet_col = snippet_sql()
+        ranking = " ORDER BY f.rank"
+    else:
+        snippet_col = "f.body"
+        ranking = " ORDER BY f.rowid DESC"
+
     conn = connect()
     cur = conn.cursor()
+    # 合同元数据之外的文本列均取自索引表，不读取 contracts.rendered_html
     cur.execute(
-        "SELECT id, template_id, tenant_name, id_card, room_no, start_date, end_date, rent, rendered_html, created_at FROM contracts WHERE id = ?",
-        (contract_id,),
+        "SELECT " + projection.sql + ", " + snippet_col
+        + " FROM contracts_fts f JOIN contracts c ON c.id = f.rowid"
+        + filters.where() + ranking + " LIMIT ?",
+        filters.params + [limit],
     )
+    rows = cur.fetchall()
+    conn.close()
+
+    items = []
+    for r in rows:
+        item = projection.record(r)
+        item["snippet"] = render_snippet(r[-1] if fts_terms else excerpt(r[-1], short_terms))
+        items.append(item)
+    return jsonify({"items": items, "q": q})
+
+
+@contracts_bp.route("/<int:contract_id>", methods=["GET"])  # GET /api/contracts/:id
+@conditional_get("contracts")
+def get_contract(contract_id: int):
+    try:
+        projection = CONTRACT_DETAIL_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({"message": str(e)}), 400
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("SELECT " + projection.sql + " FROM contracts WHERE id = ?", (contract_id,))
     r = cur.fetchone()
     conn.close()
     if not r:
         return jsonify({"message": "Not found"}), 404
-    return jsonify(
-        {
-            "id": r[0],
-            "template_id": r[1],
-            "tenant_name": r[2],
-            "id_card": r[3],
-            "room_no": r[4],
-            "start_date": r[5],
-            "end_date": r[6],
-            "rent": r[7],
-            "rendered_html": r[8],
-            "created_at": r[9],
-        }
-    )
+    return jsonify(projection.record(r))
 
 
 @contracts_bp.route("/<int:contract_id>", methods=["PUT"])  # PUT /api/contracts/:id
+@invalidates("contracts")
 def update_contract(contract_id: int):
     payload = request.get_json(force=True) or {}
     vars_obj = payload.get("vars") or {}
@@ -415,6 +480,7 @@ def update_contract(contract_id: int):
             contract_id,
         ),
     )
+    index_contract(cur, contract_id, rendered, tenant_name, room_no, id_card)
     conn.commit()
     conn.close()
 
@@ -0,0 +1,161 @@
+import csv
+import io
+from datetime import date
+from urllib.parse import quote
+
+from flask import Blueprint, current_app, jsonify, request, stream_with_context
+
+from auth_api import token_required
+from common import connect
+from contracts_api import CONTRACT_FIELDS, contract_filters
+from listing import FieldSet, ListQueryError, order_by
+from moves_api import MOVE_FIELDS, MOVE_SORT, MOVES_FROM, move_filters
+from repair_records_api import REPAIR_FIELDS, REPAIR_SORT, repair_filters
+from tenants_api import TENANT_FIELDS, TENANT_SORT, tenant_filters
+
+
+export_bp = Blueprint('export', __name__, url_prefix='/api')
+
+# 每次从游标读取的行数；导出全程只在内存中保留一批
+BATCH_SIZE = 1000
+
+# 导出实体：字段（默认全部列）、数据来源、筛选条件（与列表接口一致）、排序、中文表头
+EXPORTS = {
+    'tenants': {
+        'label': '租户',
+        'fields': FieldSet(TENANT_FIELDS.columns.items()),
+        'source': " FROM tenants t LEFT JOIN rooms r ON t.room_id = r.id",
+        'filters': tenant_filters,
+        'sort': order_by(TENANT_SORT),
+        'headers': {
+            'id': 'ID', 'name': '姓名', 'gender': '性别', 'nation': '民族', 'birth_date': '出生日期',
+            'id_card': '身份证号', 'address': '住址', 'issuing_authority': '签发机关',
+            'valid_from': '有效期起', 'valid_to': '有效期止', 'phone': '手机号',
+            'emergency_contact_name': '紧急联系人', 'emergency_contact_phone': '紧急联系人电话',
+            'check_in_date': '入住日期', 'check_out_date': '退租日期', 'room_no': '房号',
+            'building': '楼栋', 'remarks': '备注', 'status': '状态',
+            'front_img': '身份证正面', 'back_img': '身份证反面',
+        },
+    },
+    'repairs': {
+        'label': '维修记录',
+        'fields': FieldSet(REPAIR_FIELDS.columns.items()),
+        'source': " FROM repair_records",
+        'filters': repair_filters,
+        'sort': order_by(REPAIR_SORT, descending=True),
+        'headers': {
+            'id': 'ID', 'building': '楼栋', 'room_no': '房号', 'repair_type': '维修类型',
+            'description': '问题描述', 'report_date': '报修日期', 'report_by': '报修人', 'status': '状态',
+            'repair_date': '维修日期', 'repair_cost': '维修费用', 'repair_person': '维修人', 'remarks': '备注',
+        },
+    },
+    'moves': {
+        'label': '搬迁记录',
+        'fields': FieldSet(MOVE_FIELDS.columns.items()),
+        'source': MOVES_FROM,
+        'filters': move_filters,
+        'sort': order_by(MOVE_SORT, descending=True),
+        'headers': {
+            'id': 'ID', 'tenant_id': '租户ID', 'tenant_name': '租户姓名', 'from_room': '原房间',
+            'to_room': '新房间', 'move_date': '搬迁日期',
+        },
+    },
+    'contracts': {
+        'label': '合同',
+        'fields': FieldSet(CONTRACT_FIELDS.columns.items()),
+        'source': " FROM contracts",
+        'filters': contract_filters,
+        'sort': order_by(['id'], descending=True),
+        'headers': {
+            'id': 'ID', 'template_id': '模板ID', 'tenant_id': '租户ID', 'room_id': '房间ID',
+            'tenant_name': '租户姓名', 'id_card': '身份证号', 'room_no': '房号', 'start_date': '起租日期',
+            'end_date': '到期日期', 'rent': '租金', 'created_at': '创建时间', 'updated_at': '更新时间',
+        },
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+# 以文本写出的列：Excel 会把 18 位身份证号转为科学计数法并丢失末尾数字，手机号同样按数字处理
+TEXT_COLUMNS = {'id_card', 'phone', 'emergency_contact_phone'}
+
+# Excel 视为公式开头的字符
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value, text=False):
+    if value is None:
+        return ''
+    if text and value != '':
+        # ="..." 在 Excel 中显示为原样文本；导入时 bulk_import 会还原
+        return '="' + str(value).replace('"', '""') + '"'
+    # 防止以公式字符开头的文本在 Excel 中被当作公式执行
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(rows, text_columns=()):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerows([_csv_cell(v, i in text_columns) for i, v in enumerate(row)] for row in rows)
+    return buf.getvalue().encode('utf-8')
+
+
+@export_bp.route('/export/<entity>', methods=['GET'])
+@token_required
+def api_export(current_user, entity):
+    """按列表接口的筛选条件导出全部记录（CSV 或 NDJSON），边查询边输出"""
+    spec = EXPORTS.get(entity)
+    if spec is None:
+        return jsonify({'error': f"不支持的导出类型 {entity}，可选: {', '.join(EXPORTS)}"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"不支持的导出格式 {fmt}，可选: {', '.join(FORMATS)}"}), 400
+    try:
+        projection = spec['fields'].parse(request.args)
+        filters = spec['filters'](request.args)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT " + projection.sql + spec['source'] + filters.where() + spec['sort'],
+        filters.params,
+    )
+    encode = current_app.json.dumps_bytes
+    keys = projection.keys
+    text_columns = {i for i, k in enumerate(keys) if k in TEXT_COLUMNS}
+
+    def generate():
+        try:
+            if fmt == 'csv':
+                # UTF-8 BOM：Excel 据此识别编码，中文表头与内容不乱码
+                yield b'\xef\xbb\xbf' + _csv_lines([[spec['headers'].get(k, k) for k in keys]])
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                rows = [row[:len(keys)] for row in rows]
+                if fmt == 'csv':
+                    yield _csv_lines(rows, text_columns)
+                else:
+                    yield b''.join(encode(dict(zip(keys, row))) + b'\n' for row in rows)
+        finally:
+            cursor.close()
+            conn.close()
+
+    filename = f"{spec['label']}_{date.today():%Y%m%d}.{fmt}"
+    response = current_app.response_class(stream_with_context(generate()), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=\"{entity}_{date.today():%Y%m%d}.{fmt}\"; filename*=UTF-8''{quote(filename)}"
+    )
+    # 让 nginx 直接转发数据块而不是先缓冲整个文件
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -1,47 +1,11 @@
 import hashlib
 from common import connect
 
-def ensure_schema():
-    """Ensure admins table exists and has recovery fields for forgot password."""
-    conn = connect()
-    cursor = conn.cursor()
-
-    # Ensure base admins table exists
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT,
-            created_at DATE DEFAULT (DATE('now'))
-        )
-        """
-    )
-
-    # Inspect existing columns
-    cursor.execute("PRAGMA table_info(admins)")
-    cols = {row[1] for row in cursor.fetchall()}
-
-    # Add recovery phrase hash column
-    if 'recovery_phrase_hash' not in cols:
-        cursor.execute("ALTER TABLE admins ADD COLUMN recovery_phrase_hash TEXT")
-    # Add security question text column
-    if 'security_question' not in cols:
-        cursor.execute("ALTER TABLE admins ADD COLUMN security_question TEXT")
-    # Add security answer hash column
-    if 'security_answer_hash' not in cols:
-        cursor.execute("ALTER TABLE admins ADD COLUMN security_answer_hash TEXT")
-
-    conn.commit()
-    conn.close()
-
 def sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 def verify_and_reset_password(username: str, answer: str, new_password: str):
     """仅通过安全问题答案找回并重置密码。"""
-    ensure_schema()
     conn = connect()
     cursor = conn.cursor()
 
@@ -72,7 +36,6 @@ def verify_and_reset_password(username: str, answer: str, new_password: str):
 
 def set_recovery_info(username: str, recovery_phrase: str | None = None, security_question: str | None = None, security_answer: str | None = None):
     """Helper to set recovery phrase and/or security question/answer for a user."""
-    ensure_schema()
     conn = connect()
     cursor = conn.cursor()
     cursor.execute("SELECT id FROM admins WHERE username = ?", (username,))
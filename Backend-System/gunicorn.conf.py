@@ -0,0 +1,18 @@
+"""Gunicorn settings for the API (``gunicorn -c gunicorn.conf.py app:app``)."""
+bind = '0.0.0.0:5000'
+workers = 3
+# 结构版本检查只在主进程执行一次
+preload_app = True
+# 卡住的请求 30 秒后由主进程重启工作进程；耗时的导出由 gunicorn.export.conf.py 单独运行
+timeout = 30
+
+
+def post_fork(server, worker):
+    # 模型在各工作进程 fork 之后加载，不在主进程中加载后跨 fork 共享
+    import ocr_engine
+    cfg = ocr_engine.load_config()
+    # 启用 OCR 进程池时识别在 ocr_worker 中进行，API 进程不加载模型
+    if cfg['worker_pool'].get('enabled'):
+        return
+    if ocr_engine.warmup(cfg):
+        server.log.info("worker %s: PaddleOCR 模型已预加载", worker.pid)
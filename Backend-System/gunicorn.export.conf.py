@@ -0,0 +1,16 @@
+"""Gunicorn settings for the export server (``gunicorn -c gunicorn.export.conf.py app:app``).
+
+Nginx routes ``/api/export/`` here, so a long export never occupies one of
+the API's sync workers. The same app is loaded; only the worker model
+differs. A ``gthread`` worker streams each export on its own thread while
+the main thread keeps answering the arbiter's heartbeat, so exports that
+run for minutes do not hit ``timeout``; nginx's ``proxy_read_timeout``
+bounds them instead.
+"""
+bind = '127.0.0.1:5001'
+workers = 1
+worker_class = 'gthread'
+# 同时进行的导出数
+threads = 4
+# 结构版本检查只在主进程执行一次
+preload_app = True
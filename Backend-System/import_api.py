@@ -0,0 +1,77 @@
+from flask import Blueprint, jsonify, request
+
+from auth_api import token_required
+from bulk_import import (
+    DEFAULT_CHUNK_SIZE, ImportJobError, create_job, get_job, job_errors, list_jobs, rollback_job, start_job,
+)
+from common import connect
+from response_cache import invalidates
+
+
+import_bp = Blueprint('import', __name__, url_prefix='/api/import')
+
+
+@import_bp.route('/<entity>', methods=['POST'])
+@token_required
+def api_start_import(current_user, entity):
+    """上传 CSV / XLSX 文件并在后台分批导入，返回任务供轮询进度"""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': '请上传文件 file'}), 400
+    try:
+        chunk_size = int(request.form.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({'error': 'chunk_size 须为整数'}), 400
+
+    try:
+        job = create_job(entity, upload.filename, upload.save, chunk_size, current_user['username'])
+        start_job(job['id'])
+    except ImportJobError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': '导入任务已开始', 'job': job}), 202
+
+
+@import_bp.route('/jobs', methods=['GET'])
+@token_required
+def api_list_import_jobs(current_user):
+    conn = connect()
+    jobs = list_jobs(conn)
+    conn.close()
+    return jsonify({'jobs': jobs})
+
+
+@import_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def api_get_import_job(current_user, job_id):
+    """导入进度（processed_rows / total_rows）与前 100 条错误"""
+    conn = connect()
+    job = get_job(conn, job_id)
+    if job is None:
+        conn.close()
+        return jsonify({'error': f'导入任务 {job_id} 不存在'}), 404
+    errors = job_errors(conn, job_id)
+    conn.close()
+    return jsonify({'job': job, 'errors': errors})
+
+
+@import_bp.route('/jobs/<int:job_id>/resume', methods=['POST'])
+@token_required
+def api_resume_import_job(current_user, job_id):
+    """从最后提交的批次之后继续执行失败或中断的导入任务"""
+    try:
+        start_job(job_id)
+    except ImportJobError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'message': f'导入任务 {job_id} 已继续执行'}), 202
+
+
+@import_bp.route('/jobs/<int:job_id>/rollback', methods=['POST'])
+@token_required
+@invalidates('rooms', 'tenants')
+def api_rollback_import_job(current_user, job_id):
+    """删除导入任务写入的记录（已被引用的房间保留）"""
+    try:
+        deleted, kept = rollback_job(job_id)
+    except ImportJobError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'message': f'导入任务 {job_id} 已回滚', 'deleted': deleted, 'kept': kept})
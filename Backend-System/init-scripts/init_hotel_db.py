@@ -9,6 +9,9 @@ import shutil
 # 允许从父目录导入 common 模块
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from common import connect, DB_NAME
+from migrations import migrate, current_version
+from occupancy import refresh_rooms
+from contract_search import reindex_contracts
 
 
 def sha256(text: str) -> str:
@@ -16,149 +19,8 @@ def sha256(text: str) -> str:
 
 
 def ensure_tables():
-    """Create all required tables if missing and ensure recovery columns."""
-    conn = connect()
-    cur = conn.cursor()
-
-    # rooms
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS rooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            building TEXT,
-            floor INTEGER,
-            room_no TEXT UNIQUE NOT NULL,
-            room_type TEXT,
-            price REAL,
-            status TEXT DEFAULT '空闲'
-        )
-        """
-    )
-
-    # tenants
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tenants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            gender TEXT,
-            nation TEXT,
-            birth_date DATE,
-            id_card TEXT UNIQUE,
-            address TEXT,
-            issuing_authority TEXT,
-            valid_from DATE,
-            valid_to DATE,
-            front_img TEXT,
-            back_img TEXT,
-            phone TEXT,
-            emergency_contact_name TEXT,
-            emergency_contact_phone TEXT,
-            check_in_date DATE,
-            check_out_date DATE,
-            room_id INTEGER,
-            remarks TEXT,
-            status TEXT DEFAULT '在住',
-            FOREIGN KEY (room_id) REFERENCES rooms(id)
-        )
-        """
-    )
-
-    # tenant_moves
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tenant_moves (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tenant_id INTEGER,
-            old_room_id INTEGER,
-            new_room_id INTEGER,
-            move_date DATE,
-            remarks TEXT,
-            FOREIGN KEY (tenant_id) REFERENCES tenants(id),
-            FOREIGN KEY (old_room_id) REFERENCES rooms(id),
-            FOREIGN KEY (new_room_id) REFERENCES rooms(id)
-        )
-        """
-    )
-
-    # admins base table
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT,
-            created_at DATE DEFAULT (DATE('now'))
-        )
-        """
-    )
-    # ensure recovery columns
-    cur.execute("PRAGMA table_info(admins)")
-    cols = {row[1] for row in cur.fetchall()}
-    if "recovery_phrase_hash" not in cols:
-        cur.execute("ALTER TABLE admins ADD COLUMN recovery_phrase_hash TEXT")
-    if "security_question" not in cols:
-        cur.execute("ALTER TABLE admins ADD COLUMN security_question TEXT")
-    if "security_answer_hash" not in cols:
-        cur.execute("ALTER TABLE admins ADD COLUMN security_answer_hash TEXT")
-
-    # repair_records
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS repair_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            building TEXT,
-            room_no TEXT NOT NULL,
-            repair_type TEXT,
-            description TEXT,
-            report_date DATE,
-            report_by TEXT,
-            status TEXT DEFAULT '待处理',
-            repair_date DATE,
-            repair_cost REAL,
-            repair_person TEXT,
-            remarks TEXT,
-            FOREIGN KEY (room_no) REFERENCES rooms(room_no)
-        )
-        """
-    )
-
-    # contract_templates (合同模板)
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS contract_templates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            content_html TEXT NOT NULL,
-            created_at DATETIME DEFAULT (DATETIME('now')),
-            updated_at DATETIME DEFAULT (DATETIME('now'))
-        )
-        """
-    )
-
-    # contracts (合同档案)
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS contracts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_id INTEGER NOT NULL,
-            tenant_name TEXT,
-            id_card TEXT,
-            room_no TEXT,
-            start_date TEXT,
-            end_date TEXT,
-            rent REAL,
-            rendered_html TEXT NOT NULL,
-            created_at TEXT NOT NULL DEFAULT (datetime('now')),
-            updated_at TEXT
-        )
-        """
-    )
-
-    conn.commit()
-    conn.close()
+    """Apply pending schema migrations (creates missing tables and columns)."""
+    return migrate()
 
 
 def seed_demo_data():
@@ -402,28 +264,19 @@ def seed_demo_data():
         )
 
     # 7) 根据租户入住情况更新房间状态
-    cur.execute(
-        """
-        UPDATE rooms
-        SET status = CASE
-            WHEN EXISTS (
-                SELECT 1 FROM tenants t
-                WHERE t.room_id = rooms.id
-                  AND t.status = '在住'
-                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-            ) THEN '已入住'
-            ELSE '空闲'
-        END
-        """
-    )
+    refresh_rooms(cur)
+
+    # 8) 建立合同全文索引
+    reindex_contracts(cur)
 
     conn.commit()
     conn.close()
     print("✅ 已插入演示数据：房间、租户、调房、维修、合同模板与合同")
 
 
-def create_default_admin(username: str = "admin", password: str = "123456", full_name: str = "管理员"):
-    """Create default admin if not exists."""
+def create_default_admin(username: str = "admin", password: str = "123456", full_name: str = "管理员",
+                         security_answer: str = "15286304124"):
+    """Create default admin (with forgot-password answer) if not exists."""
     conn = connect()
     cur = conn.cursor()
     cur.execute("SELECT id FROM admins WHERE username = ?", (username,))
@@ -431,8 +284,8 @@ def create_default_admin(username: str = "admin", password: str = "123456", full
         conn.close()
         return False, f"管理员 {username} 已存在"
     cur.execute(
-        "INSERT INTO admins (username, password_hash, full_name) VALUES (?, ?, ?)",
-        (username, sha256(password), full_name),
+        "INSERT INTO admins (username, password_hash, full_name, security_answer_hash) VALUES (?, ?, ?, ?)",
+        (username, sha256(password), full_name, sha256(security_answer)),
     )
     conn.commit()
     conn.close()
@@ -484,7 +337,7 @@ def ensure_sql_dir_and_migrate_db():
 
 def main():
     parser = argparse.ArgumentParser(description="初始化/检查酒店管理数据库")
-    parser.add_argument("--init", action="store_true", help="创建缺失的表和必要列")
+    parser.add_argument("--init", action="store_true", help="应用数据库结构迁移（创建缺失的表和必要列）")
     parser.add_argument("--create-default-admin", action="store_true", help="若无管理员则创建默认 admin/123456")
     parser.add_argument("--summarize", action="store_true", help="输出当前数据库的表与行数概览")
     parser.add_argument("--compact", action="store_true", help="以紧凑格式输出表名与行数")
@@ -495,8 +348,11 @@ def main():
     ensure_sql_dir_and_migrate_db()
 
     if args.init:
-        ensure_tables()
-        print("✅ 表结构已确保存在并更新。")
+        applied = ensure_tables()
+        if applied:
+            print(f"✅ 已应用迁移 {', '.join(str(v) for v in applied)}，当前结构版本 {current_version()}。")
+        else:
+            print(f"✅ 表结构已是最新版本 {current_version()}。")
 
     if args.create_default_admin:
         created, msg = create_default_admin()
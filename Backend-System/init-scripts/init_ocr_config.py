@@ -11,6 +11,7 @@ def get_config_file_path() -> str:
 
 DEFAULT_CONFIG = {
     "preferred_engine": "paddleocr",
+    "warmup": True,
     "paddleocr": {
         "lang": "ch",
         "use_angle_cls": True,
@@ -19,6 +20,28 @@ DEFAULT_CONFIG = {
             "rec": True,
             "cls": True
         }
+    },
+    "preprocess": {
+        "enabled": True,
+        "exif_orientation": True,
+        "crop_card": True,
+        "crop_min_area": 0.2,
+        "max_side": 1600,
+        "grayscale": False,
+        "contrast": None
+    },
+    "cache": {
+        "enabled": True,
+        "max_entries": 5000
+    },
+    "worker_pool": {
+        "enabled": True,
+        "processes": 2,
+        "job_timeout": 60,
+        "max_queue": 20,
+        "max_rss_mb": 2048,
+        "poll_interval": 0.2,
+        "keep_days": 7
     }
 }
 
@@ -0,0 +1,42 @@
+"""JSON encoding for the app: orjson when installed, the standard library otherwise.
+
+``FastJSONProvider`` replaces Flask's default provider, so ``jsonify`` and
+``request.get_json`` use orjson (an optional dependency, ``pip install orjson``)
+and produce UTF-8 bytes directly. The output stays compatible with Flask's
+defaults: sorted keys, and dates rendered as HTTP dates.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps_bytes(self, obj, indent=False):
+        """Encode ``obj`` to UTF-8 JSON bytes."""
+        if orjson is None:
+            layout = {'indent': 2} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, ensure_ascii=False, **layout).encode('utf-8')
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
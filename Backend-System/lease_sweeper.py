@@ -0,0 +1,91 @@
+"""Lease-expiry sweeper.
+
+Checks out tenants whose lease has ended and re-checks room occupancy that
+changes with the date (leases starting or ending today), all in one
+transaction. It runs once per day boundary as a supervisord program
+(``python lease_sweeper.py --loop``) and on demand via
+``POST /api/tenants/sweep`` or ``python lease_sweeper.py``.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import connect
+from occupancy import refresh_rooms
+
+
+logger = logging.getLogger('lease_sweeper')
+
+# 跨过零点后稍等几秒再执行，避免时钟误差导致仍按前一天计算
+DAY_BOUNDARY_GRACE = 5
+# 扫描失败（如数据库被锁）后的重试间隔：从 30 秒起每次翻倍，最长 30 分钟
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 30 * 60
+
+
+def sweep(conn=None):
+    """Apply lease-expiry transitions; returns ``(tenants_checked_out, rooms_updated)``."""
+    own = conn is None
+    conn = conn or connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE tenants
+                SET status = '已退租'
+                WHERE status = '在住' AND DATE('now') > check_out_date
+                """
+            )
+            expired = cur.rowcount
+            rooms = refresh_rooms(cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        if own:
+            conn.close()
+    logger.info("租期扫描完成：自动退租 %s 人，更新房间状态 %s 间", expired, rooms)
+    return expired, rooms
+
+
+def seconds_until_next_day(now=None):
+    """Seconds until the next UTC midnight (SQLite's DATE('now') is UTC)."""
+    now = now or datetime.now(timezone.utc)
+    next_day = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (next_day - now).total_seconds() + DAY_BOUNDARY_GRACE
+
+
+def run_forever():
+    """Sweep at startup, then once after every day boundary; a failed sweep is retried with backoff."""
+    delay = RETRY_DELAY
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"租期扫描失败，{delay} 秒后重试: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            continue
+        delay = RETRY_DELAY
+        time.sleep(seconds_until_next_day())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="租期到期扫描：自动退租并更新房间状态")
+    parser.add_argument("--loop", action="store_true", help="常驻运行，每跨过一天执行一次")
+    args = parser.parse_args()
+
+    if args.loop:
+        run_forever()
+    else:
+        expired, rooms = sweep()
+        print(f"✅ 自动退租 {expired} 人，更新房间状态 {rooms} 间")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
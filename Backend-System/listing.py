@@ -0,0 +1,186 @@
+"""Shared helpers for list endpoints: limits, opaque keyset cursors and SQL filters.
+
+A list endpoint collects its WHERE clauses in a ``Filters`` object, adds the
+keyset condition for the ``after`` cursor, fetches ``limit + 1`` rows and
+lets ``page_rows`` cut the page and produce the next cursor. ``FieldSet``
+maps the ``fields=`` parameter onto the SELECT list and the JSON keys. Search
+endpoints use the FTS5 query helpers at the bottom.
+"""
+import base64
+import binascii
+import json
+
+
+DEFAULT_MAX_LIMIT = 500
+
+# trigram 分词器只索引 3 个字符以上的片段，更短的关键词改用 LIKE
+FTS_MIN_TERM = 3
+
+
+class ListQueryError(ValueError):
+    """Invalid list query parameter; endpoints answer it with HTTP 400."""
+
+
+def parse_limit(args, default=None, maximum=DEFAULT_MAX_LIMIT):
+    """Return the ``limit`` query parameter capped at ``maximum`` (``default`` when absent)."""
+    raw = args.get('limit')
+    if raw in (None, ''):
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ListQueryError('limit 必须是正整数')
+    if limit <= 0:
+        raise ListQueryError('limit 必须是正整数')
+    return min(limit, maximum)
+
+
+def parse_flag(args, name):
+    return str(args.get(name, '')).lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode an ``after`` cursor into ``size`` sort-key values."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ListQueryError('无效的分页游标')
+    if not isinstance(values, list) or len(values) != size:
+        raise ListQueryError('无效的分页游标')
+    return values
+
+
+class Filters:
+    """AND-ed WHERE clauses with their positional parameters."""
+
+    def __init__(self):
+        self.clauses = []
+        self.params = []
+
+    def add(self, clause, *params):
+        self.clauses.append(clause)
+        self.params.extend(params)
+        return self
+
+    def equal(self, column, value):
+        """``column = value`` when the query parameter was given."""
+        if value not in (None, ''):
+            self.add(f"{column} = ?", value)
+        return self
+
+    def one_of(self, column, values):
+        """``column IN (...)`` when a list of values was given."""
+        if values:
+            self.add(f"{column} IN ({', '.join('?' for _ in values)})", *values)
+        return self
+
+    def date_range(self, column, start, end):
+        """Inclusive ``start <= column <= end`` on ISO date strings; either bound is optional."""
+        if start:
+            self.add(f"{column} >= ?", start)
+        if end:
+            # 兼容 DATETIME 列：结束日期当天的任意时刻都算在内
+            self.add(f"{column} <= ?", end + ' 23:59:59' if len(end) == 10 else end)
+        return self
+
+    def after(self, sort_columns, token, descending=False):
+        """Keyset condition: rows strictly after the cursor in sort order."""
+        if token:
+            values = decode_cursor(token, len(sort_columns))
+            op = '<' if descending else '>'
+            marks = ', '.join('?' for _ in sort_columns)
+            self.add(f"({', '.join(sort_columns)}) {op} ({marks})", *values)
+        return self
+
+    def copy(self):
+        other = Filters()
+        other.clauses = list(self.clauses)
+        other.params = list(self.params)
+        return other
+
+    def where(self):
+        return (" WHERE " + " AND ".join(self.clauses)) if self.clauses else ""
+
+
+def order_by(sort_columns, descending=False):
+    direction = ' DESC' if descending else ''
+    return " ORDER BY " + ", ".join(c + direction for c in sort_columns)
+
+
+def limit_clause(limit):
+    # 多取一行用于判断是否还有下一页
+    return f" LIMIT {int(limit) + 1}" if limit else ""
+
+
+def page_rows(rows, limit, cursor_of):
+    """Cut ``rows`` (fetched with ``limit_clause``) to one page; returns ``(rows, next_cursor)``."""
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(cursor_of(rows[-1]))
+
+
+class FieldSet:
+    """JSON key → SQL expression map behind the ``fields=`` query parameter.
+
+    ``default`` is the projection used when ``fields`` is absent (``fields=all``
+    selects every column); ``required`` keys are always selected, e.g. the
+    sort keys a cursor is built from, but only serialized when requested.
+    """
+
+    def __init__(self, columns, default=None, required=()):
+        self.columns = dict(columns)
+        self.default = list(default or self.columns)
+        self.required = list(required)
+
+    def parse(self, args):
+        """Return the ``Projection`` requested by ``args``."""
+        raw = (args.get('fields') or '').strip()
+        if not raw:
+            keys = self.default
+        elif raw in ('all', '*'):
+            keys = list(self.columns)
+        else:
+            keys = list(dict.fromkeys(k.strip() for k in raw.split(',') if k.strip()))
+            unknown = [k for k in keys if k not in self.columns]
+            if unknown or not keys:
+                raise ListQueryError(f"未知字段: {', '.join(unknown)}，可选: {', '.join(self.columns)}")
+        return Projection(self, keys)
+
+
+class Projection:
+    """The selected keys of a ``FieldSet``; rows are fetched in ``selected`` order."""
+
+    def __init__(self, fieldset, keys):
+        self.keys = keys
+        self.selected = keys + [k for k in fieldset.required if k not in keys]
+        self.sql = ', '.join(fieldset.columns[k] for k in self.selected)
+
+    def value(self, row, key):
+        return row[self.selected.index(key)]
+
+    def record(self, row):
+        return dict(zip(self.keys, row))
+
+
+def split_search_terms(q):
+    """Split a search string into ``(fts_terms, short_terms)`` by trigram length."""
+    terms = (q or '').split()
+    return [t for t in terms if len(t) >= FTS_MIN_TERM], [t for t in terms if len(t) < FTS_MIN_TERM]
+
+
+def fts_match(terms):
+    """FTS5 MATCH expression requiring every term as a literal substring."""
+    return ' AND '.join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def like_contains(term):
+    """``LIKE ... ESCAPE '\\'`` pattern matching ``term`` anywhere."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
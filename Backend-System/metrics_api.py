@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+
+from auth_api import token_required
+
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api')
+
+# 各模块注册的运行指标：名称 -> 返回 dict 的函数
+_providers = {}
+
+
+def register(name, provider):
+    """Expose ``provider()`` under ``name`` in ``GET /api/metrics``."""
+    _providers[name] = provider
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@token_required
+def get_metrics(current_user):
+    """当前工作进程的运行指标（缓存命中率等）"""
+    return jsonify({name: provider() for name, provider in _providers.items()})
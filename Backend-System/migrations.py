@@ -0,0 +1,511 @@
+"""Versioned schema migrations for hotel.db.
+
+Each migration is a numbered function registered with ``@migration`` and is
+applied exactly once, in order; applied versions are recorded in the
+``schema_version`` table. Pending migrations are applied by
+``init-scripts/init_hotel_db.py --init`` or ``python migrations.py``, so app
+workers only need to read one integer at startup.
+"""
+import argparse
+import logging
+
+from common import connect
+from contract_search import reindex_contracts
+from occupancy import refresh_rooms
+
+
+logger = logging.getLogger('migrations')
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    """Register ``fn(cursor)`` as schema migration ``version``."""
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _columns(cur, table: str) -> set:
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _add_columns(cur, table: str, columns):
+    """Add each ``(name, type_def)`` column that the table does not have yet."""
+    existing = _columns(cur, table)
+    for name, type_def in columns:
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {type_def}")
+
+
+@migration(1, 'baseline schema')
+def _baseline(cur):
+    """Tables previously created by ensure_tables / ensure_*_schema at boot."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            building TEXT,
+            floor INTEGER,
+            room_no TEXT UNIQUE NOT NULL,
+            room_type TEXT,
+            price REAL,
+            status TEXT DEFAULT '空闲'
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tenants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            gender TEXT,
+            nation TEXT,
+            birth_date DATE,
+            id_card TEXT UNIQUE,
+            address TEXT,
+            issuing_authority TEXT,
+            valid_from DATE,
+            valid_to DATE,
+            front_img TEXT,
+            back_img TEXT,
+            phone TEXT,
+            emergency_contact_name TEXT,
+            emergency_contact_phone TEXT,
+            check_in_date DATE,
+            check_out_date DATE,
+            room_id INTEGER,
+            remarks TEXT,
+            status TEXT DEFAULT '在住',
+            FOREIGN KEY (room_id) REFERENCES rooms(id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tenant_moves (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id INTEGER,
+            old_room_id INTEGER,
+            new_room_id INTEGER,
+            move_date DATE,
+            remarks TEXT,
+            FOREIGN KEY (tenant_id) REFERENCES tenants(id),
+            FOREIGN KEY (old_room_id) REFERENCES rooms(id),
+            FOREIGN KEY (new_room_id) REFERENCES rooms(id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT,
+            created_at DATE DEFAULT (DATE('now'))
+        )
+        """
+    )
+    # 找回密码字段
+    _add_columns(cur, 'admins', [
+        ('recovery_phrase_hash', 'TEXT'),
+        ('security_question', 'TEXT'),
+        ('security_answer_hash', 'TEXT'),
+    ])
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS repair_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            building TEXT,
+            room_no TEXT NOT NULL,
+            repair_type TEXT,
+            description TEXT,
+            report_date DATE,
+            report_by TEXT,
+            status TEXT DEFAULT '待处理',
+            repair_date DATE,
+            repair_cost REAL,
+            repair_person TEXT,
+            remarks TEXT,
+            FOREIGN KEY (room_no) REFERENCES rooms(room_no)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contract_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            content_html TEXT NOT NULL,
+            created_at DATETIME DEFAULT (DATETIME('now')),
+            updated_at DATETIME DEFAULT (DATETIME('now'))
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contracts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id INTEGER,
+            room_id INTEGER,
+            template_id INTEGER NOT NULL,
+            tenant_name TEXT,
+            id_card TEXT,
+            room_no TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            rent REAL,
+            rendered_html TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT
+        )
+        """
+    )
+    # 旧版 contracts 表可能缺少的列
+    _add_columns(cur, 'contracts', [
+        ('room_id', 'INTEGER'),
+        ('tenant_id', 'INTEGER'),
+        ('template_id', 'INTEGER'),
+        ('tenant_name', 'TEXT'),
+        ('id_card', 'TEXT'),
+        ('room_no', 'TEXT'),
+        ('start_date', 'TEXT'),
+        ('end_date', 'TEXT'),
+        ('rent', 'REAL'),
+        ('rendered_html', 'TEXT'),
+        ('created_at', 'TEXT'),
+        ('updated_at', 'TEXT'),
+    ])
+
+
+@migration(2, 'indexes for hot query shapes')
+def _hot_query_indexes(cur):
+    # 在住租户：房间占用判断（room_id + 入住区间）与到期退租扫描
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tenants_active_room
+        ON tenants(room_id, check_in_date, check_out_date) WHERE status = '在住'
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tenants_active_check_out
+        ON tenants(check_out_date) WHERE status = '在住'
+        """
+    )
+    # 含已退租租户的房间统计（删除房间前检查）
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tenants_room ON tenants(room_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_repair_records_room_date ON repair_records(room_no, report_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tenant_moves_tenant ON tenant_moves(tenant_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tenant_moves_old_room ON tenant_moves(old_room_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tenant_moves_new_room ON tenant_moves(new_room_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contracts_template ON contracts(template_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contracts_tenant ON contracts(tenant_id)")
+    cur.execute("ANALYZE")
+
+
+@migration(3, 'stored room occupancy')
+def _room_occupancy(cur):
+    _add_columns(cur, 'rooms', [('occupant_count', 'INTEGER NOT NULL DEFAULT 0')])
+    refresh_rooms(cur)
+
+
+@migration(4, 'tenant full-text search index')
+def _tenant_search_index(cur):
+    # trigram 分词：中文姓名/地址与手机号、身份证号都可按任意连续 3 个字符以上的片段检索
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tenants_fts USING fts5(
+            name, phone, id_card, address, remarks,
+            content='tenants', content_rowid='id', tokenize='trigram'
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tenants_fts_ai AFTER INSERT ON tenants BEGIN
+            INSERT INTO tenants_fts(rowid, name, phone, id_card, address, remarks)
+            VALUES (new.id, new.name, new.phone, new.id_card, new.address, new.remarks);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tenants_fts_ad AFTER DELETE ON tenants BEGIN
+            INSERT INTO tenants_fts(tenants_fts, rowid, name, phone, id_card, address, remarks)
+            VALUES ('delete', old.id, old.name, old.phone, old.id_card, old.address, old.remarks);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tenants_fts_au
+        AFTER UPDATE OF name, phone, id_card, address, remarks ON tenants BEGIN
+            INSERT INTO tenants_fts(tenants_fts, rowid, name, phone, id_card, address, remarks)
+            VALUES ('delete', old.id, old.name, old.phone, old.id_card, old.address, old.remarks);
+            INSERT INTO tenants_fts(rowid, name, phone, id_card, address, remarks)
+            VALUES (new.id, new.name, new.phone, new.id_card, new.address, new.remarks);
+        END
+        """
+    )
+    cur.execute("INSERT INTO tenants_fts(tenants_fts) VALUES ('rebuild')")
+
+
+@migration(5, 'contract archive full-text search index')
+def _contract_search_index(cur):
+    # 正文是 HTML，需在 Python 中提取纯文本后写入，因此索引自带内容，由合同写入路径维护
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS contracts_fts USING fts5(
+            body, tenant_name, room_no, id_card, tokenize='trigram'
+        )
+        """
+    )
+    # 删除合同（包括删除模板时级联删除的合同）时同步移除索引
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contracts_fts_ad AFTER DELETE ON contracts BEGIN
+            DELETE FROM contracts_fts WHERE rowid = old.id;
+        END
+        """
+    )
+    reindex_contracts(cur)
+
+
+@migration(6, 'repair record query indexes')
+def _repair_query_indexes(cur):
+    # 排序键与 REPAIR_SORT 一致（表达式索引），筛选后可直接按索引顺序分页
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_repair_records_status_date"
+        " ON repair_records(status, COALESCE(report_date, ''), id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_repair_records_date"
+        " ON repair_records(COALESCE(report_date, ''), id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_repair_records_type_date"
+        " ON repair_records(repair_type, COALESCE(report_date, ''), id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_repair_records_building_date"
+        " ON repair_records(building, COALESCE(report_date, ''), id)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_repair_records_person ON repair_records(repair_person)")
+    # 分面统计 GROUP BY status, repair_type 只扫描该覆盖索引，不回表读取描述等长字段
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_repair_records_facets ON repair_records(status, repair_type)")
+    cur.execute("ANALYZE repair_records")
+
+
+@migration(7, 'per-table change generation counters')
+def _change_generation(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_generation (
+            table_name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # 任一行的增删改都会使对应表的版本号加一，列表接口据此生成 ETag
+    for table in ('rooms', 'tenants', 'tenant_moves', 'repair_records', 'contracts', 'contract_templates'):
+        cur.execute("INSERT OR IGNORE INTO change_generation (table_name) VALUES (?)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE change_generation SET generation = generation + 1 WHERE table_name = '{table}';
+                END
+                """
+            )
+
+
+@migration(8, 'bulk import jobs')
+def _import_jobs(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            filename TEXT,
+            source_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            chunk_size INTEGER NOT NULL DEFAULT 200,
+            total_rows INTEGER,
+            processed_rows INTEGER NOT NULL DEFAULT 0,
+            inserted_rows INTEGER NOT NULL DEFAULT 0,
+            error_rows INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_by TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        )
+        """
+    )
+    # 每行的导入结果：写入的记录 ID（用于回滚）或错误信息
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_items (
+            job_id INTEGER NOT NULL,
+            row_no INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            entity_id INTEGER,
+            message TEXT,
+            PRIMARY KEY (job_id, row_no)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+@migration(9, 'ocr job queue')
+def _ocr_jobs(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            side TEXT,
+            image_path TEXT,
+            created_by TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            started_at TEXT,
+            finished_at TEXT,
+            worker_pid INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT
+        )
+        """
+    )
+    # 工作进程按 id 顺序领取排队中的任务
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ocr_jobs_status ON ocr_jobs(status, id)")
+
+
+@migration(10, 'ocr result cache')
+def _ocr_cache(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT NOT NULL,
+            config_key TEXT NOT NULL,
+            result TEXT NOT NULL,
+            image_path TEXT,
+            created_by TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            last_used_at TEXT DEFAULT (datetime('now')),
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ocr_cache_key ON ocr_cache(content_hash, config_key)")
+    # 超出上限时按最近使用时间淘汰
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache(last_used_at)")
+    # 进程池任务记录上传内容的哈希，识别完成后写入缓存
+    cur.execute("ALTER TABLE ocr_jobs ADD COLUMN content_hash TEXT")
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _ensure_version_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+
+def current_version(conn=None) -> int:
+    """Return the highest applied migration version (0 for an unversioned database)."""
+    own = conn is None
+    conn = conn or connect()
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+    except Exception:
+        # schema_version 表尚不存在
+        return 0
+    finally:
+        if own:
+            conn.close()
+
+
+def migrate(conn=None, target=None):
+    """Apply pending migrations up to ``target`` (default: all); returns the versions applied.
+
+    Every migration runs in its own ``BEGIN IMMEDIATE`` transaction and the
+    version is re-read after taking the write lock, so concurrent callers
+    never apply the same migration twice.
+    """
+    own = conn is None
+    conn = conn or connect()
+    applied = []
+    try:
+        _ensure_version_table(conn)
+        conn.commit()
+        for version, name, fn in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if current_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                fn(conn.cursor())
+                conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (version, name),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            logger.info("已应用数据库迁移 %s: %s", version, name)
+    finally:
+        if own:
+            conn.close()
+    return applied
+
+
+def ensure_current():
+    """Startup check: one version read, migrating only when the database is behind."""
+    version = current_version()
+    if version >= latest_version():
+        return version
+    logger.warning("数据库结构版本 %s 落后于 %s，正在迁移", version, latest_version())
+    migrate()
+    return latest_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用数据库结构迁移")
+    parser.add_argument("--status", action="store_true", help="仅输出当前与最新的结构版本")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"当前版本: {current_version()}，最新版本: {latest_version()}")
+        return
+
+    applied = migrate()
+    if applied:
+        print(f"✅ 已应用迁移: {', '.join(str(v) for v in applied)}")
+    else:
+        print(f"ℹ️ 数据库已是最新版本 {latest_version()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -3,44 +3,89 @@ from flask import Blueprint, request, jsonify
 
 from auth_api import token_required
 from common import connect
+from conditional import conditional_get
+from response_cache import invalidates
+from occupancy import refresh_rooms
+from listing import (
+    FieldSet, Filters, ListQueryError, limit_clause, order_by, page_rows, parse_flag, parse_limit,
+)
 
 
 moves_bp = Blueprint('moves', __name__, url_prefix='/api')
 
 
+# 列表排序键：搬迁日期倒序，同日按记录 ID 倒序
+MOVE_SORT = ["COALESCE(tm.move_date, '')", 'tm.id']
+
+MOVE_FIELDS = FieldSet(
+    [
+        ('id', 'tm.id'), ('tenant_id', 'tm.tenant_id'), ('tenant_name', 't.name'),
+        ('from_room', 'rf.room_no'), ('to_room', 'rt.room_no'), ('move_date', 'tm.move_date'),
+    ],
+    default=['id', 'tenant_name', 'from_room', 'to_room', 'move_date'],
+    required=['move_date', 'id'],
+)
+
+MOVES_FROM = """
+        FROM tenant_moves tm
+        JOIN tenants t ON tm.tenant_id=t.id
+        JOIN rooms rf ON tm.old_room_id=rf.id
+        JOIN rooms rt ON tm.new_room_id=rt.id
+"""
+
+
+def move_filters(args):
+    """搬迁记录的筛选条件（列表接口与导出共用）"""
+    filters = Filters()
+    filters.equal('tm.tenant_id', args.get('tenant_id'))
+    room_no = args.get('room_no')
+    if room_no:
+        filters.add('(rf.room_no = ? OR rt.room_no = ?)', room_no, room_no)
+    filters.date_range('tm.move_date', args.get('date_from'), args.get('date_to'))
+    return filters
+
+
 @moves_bp.route('/moves', methods=['GET'])
 @token_required
+@conditional_get('tenant_moves', 'tenants', 'rooms')
 def api_list_moves(current_user):
+    try:
+        limit = parse_limit(request.args)
+        projection = MOVE_FIELDS.parse(request.args)
+        filters = move_filters(request.args)
+        base_filters = filters.copy()
+        filters.after(MOVE_SORT, request.args.get('after'), descending=True)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = connect()
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT tm.id, t.name, rf.room_no, rt.room_no, tm.move_date
-        FROM tenant_moves tm
-        JOIN tenants t ON tm.tenant_id=t.id
-        JOIN rooms rf ON tm.old_room_id=rf.id
-        JOIN rooms rt ON tm.new_room_id=rt.id
-        ORDER BY tm.move_date DESC
-        """
+        "SELECT " + projection.sql
+        + MOVES_FROM + filters.where() + order_by(MOVE_SORT, descending=True) + limit_clause(limit),
+        filters.params,
     )
-    rows = cursor.fetchall()
+    rows, next_cursor = page_rows(
+        cursor.fetchall(), limit,
+        lambda row: [projection.value(row, 'move_date') or '', projection.value(row, 'id')],
+    )
+    total = None
+    if parse_flag(request.args, 'include_total'):
+        cursor.execute("SELECT COUNT(*)" + MOVES_FROM + base_filters.where(), base_filters.params)
+        total = cursor.fetchone()[0]
     conn.close()
 
-    moves = []
-    for row in rows:
-        moves.append({
-            'id': row[0],
-            'tenant_name': row[1],
-            'from_room': row[2],
-            'to_room': row[3],
-            'move_date': row[4],
-        })
+    moves = [projection.record(row) for row in rows]
 
-    return jsonify({'moves': moves})
+    result = {'moves': moves, 'next_cursor': next_cursor}
+    if total is not None:
+        result['total'] = total
+    return jsonify(result)
 
 
 @moves_bp.route('/moves/tenant', methods=['POST'])
 @token_required
+@invalidates('tenant_moves', 'tenants', 'rooms')
 def api_move_tenant(current_user):
     data = request.json
     if not data:
@@ -164,20 +209,7 @@ def api_move_tenant(current_user):
         conn.close()
         return jsonify({'error': '不支持的搬迁方式'}), 400
 
-    cursor.execute(
-        """
-        UPDATE rooms
-        SET status = CASE
-            WHEN EXISTS (
-                SELECT 1 FROM tenants t
-                WHERE t.room_id = rooms.id
-                  AND t.status = '在住'
-                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-            ) THEN '已入住'
-            ELSE '空闲'
-        END
-        """
-    )
+    refresh_rooms(cursor, [from_room_id, to_room_id])
 
     conn.commit()
     conn.close()
@@ -187,6 +219,7 @@ def api_move_tenant(current_user):
 
 @moves_bp.route('/moves/room', methods=['POST'])
 @token_required
+@invalidates('tenant_moves', 'tenants', 'rooms')
 def api_move_room(current_user):
     data = request.json
     if not data or not all(k in data for k in ('from_room_no', 'to_room_no')):
@@ -238,20 +271,7 @@ def api_move_room(current_user):
 
         moved_tenants.append({'tenant_id': tenant_id, 'tenant_name': tenant_name})
 
-    cursor.execute(
-        """
-        UPDATE rooms
-        SET status = CASE
-            WHEN EXISTS (
-                SELECT 1 FROM tenants t
-                WHERE t.room_id = rooms.id
-                  AND t.status = '在住'
-                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-            ) THEN '已入住'
-            ELSE '空闲'
-        END
-        """
-    )
+    refresh_rooms(cursor, [from_room_id, to_room_id])
 
     conn.commit()
     conn.close()
@@ -261,6 +281,7 @@ def api_move_room(current_user):
 
 @moves_bp.route('/moves/<int:move_id>', methods=['DELETE'])
 @token_required
+@invalidates('tenant_moves', 'tenants', 'rooms')
 def api_delete_move(current_user, move_id):
     """删除一条搬迁记录。
 
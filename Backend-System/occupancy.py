@@ -0,0 +1,36 @@
+"""Room occupancy stored on the rooms row (``status`` and ``occupant_count``).
+
+Write paths call ``refresh_rooms`` for the rooms they touched, in the same
+transaction as the tenant change, instead of recomputing every room. Readers
+use the stored columns directly.
+"""
+
+# 当前在住人数：状态为在住且今天落在入住区间内（命中 idx_tenants_active_room）
+_ACTIVE_COUNT = """(
+    SELECT COUNT(*) FROM tenants t
+    WHERE t.room_id = rooms.id
+      AND t.status = '在住'
+      AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
+)"""
+
+_DERIVED_STATUS = f"CASE WHEN {_ACTIVE_COUNT} > 0 THEN '已入住' ELSE '空闲' END"
+
+
+def refresh_rooms(cursor, room_ids=None):
+    """Recompute occupancy for ``room_ids``; ``None`` re-checks every room.
+
+    A full re-check only rewrites rooms whose stored values are out of date.
+    Does not commit. Returns the number of rooms updated.
+    """
+    sql = f"UPDATE rooms SET occupant_count = {_ACTIVE_COUNT}, status = {_DERIVED_STATUS}"
+    params = []
+    if room_ids is None:
+        sql += f" WHERE occupant_count IS NOT {_ACTIVE_COUNT} OR status IS NOT {_DERIVED_STATUS}"
+    else:
+        ids = sorted({rid for rid in room_ids if rid is not None})
+        if not ids:
+            return 0
+        sql += f" WHERE id IN ({', '.join('?' for _ in ids)})"
+        params = ids
+    cursor.execute(sql, params)
+    return cursor.rowcount
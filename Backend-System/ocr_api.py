@@ -1,23 +1,54 @@
+import io
+import logging
 import os
 import re
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Request, request, jsonify, current_app
 
+import ocr_cache
+import ocr_jobs
 from auth_api import token_required
+from common import OCR_MAX_UPLOAD_BYTES, connect
+from ocr_engine import PADDLE_OCR_AVAILABLE, engine_key, load_config, registry
+from ocr_preprocess import preprocess
 
 
-# PaddleOCR availability detection
-try:
-    from paddleocr import PaddleOCR
-    PADDLE_OCR_AVAILABLE = True
-except Exception:
-    PADDLE_OCR_AVAILABLE = False
-    PaddleOCR = None
-
 ocr_bp = Blueprint('ocr', __name__, url_prefix='/api')
 
+logger = logging.getLogger('ocr')
+
+# 建议客户端轮询 GET /api/ocr/jobs/<id> 的间隔（秒，Retry-After）
+POLL_INTERVAL = 1
+# POST /api/ocr/idcard 同步等待进程池结果时查询任务状态的间隔（秒）
+WAIT_INTERVAL = 0.25
+# 同步等待的上限（秒），须小于 gunicorn.conf.py 的 timeout（30），否则等待中的工作进程会被重启
+SYNC_WAIT_MAX = 25
+
+# 上传原图在后台线程写入磁盘，与识别并行
+_upload_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ocr-upload')
+
+
+class InMemoryUploadRequest(Request):
+    """Keeps uploaded files up to ``OCR_MAX_UPLOAD_BYTES`` in memory.
+
+    Werkzeug spools any upload over 500 KB to a temporary file, so reading
+    a phone photo would go through the disk. Set as ``app.request_class``.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= OCR_MAX_UPLOAD_BYTES:
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+@ocr_bp.before_request
+def _limit_upload_size():
+    # 识别接口的请求体上限低于全局 MAX_CONTENT_LENGTH（导入文件可更大）
+    request.max_content_length = OCR_MAX_UPLOAD_BYTES
+
 
 def _ensure_upload_dir():
     base_dir = os.path.dirname(__file__)
@@ -26,36 +57,6 @@ def _ensure_upload_dir():
     return upload_dir
 
 
-def _load_ocr_config():
-    base_dir = os.path.dirname(__file__)
-    cfg_path = os.path.join(base_dir, 'config', 'ocr_config.json')
-    default = {
-        "preferred_engine": "paddleocr",
-        "paddleocr": {
-            "lang": "ch",
-            "use_angle_cls": True,
-            "ocr": {
-                "det": True,
-                "rec": True,
-                "cls": True
-            }
-        },
-    }
-    try:
-        with open(cfg_path, 'r', encoding='utf-8') as f:
-            user_cfg = json.load(f)
-        def deep_update(dst, src):
-            for k, v in src.items():
-                if isinstance(v, dict) and isinstance(dst.get(k), dict):
-                    deep_update(dst[k], v)
-                else:
-                    dst[k] = v
-            return dst
-        return deep_update(default, user_cfg)
-    except Exception:
-        return default
-
-
 def _filter_none(d):
     return {k: v for k, v in (d or {}).items() if v is not None}
 
@@ -137,90 +138,324 @@ def _mask_idcard(idv: str):
     return f"{idv[:6]}****{idv[-4:]}"
 
 
-def _ocr_extract_text(save_path, cfg):
-    """Return (text, engine) according to preferred_engine; no cross-engine fallback when set."""
+def _preprocess(data, cfg):
+    """Return (image, info): the decoded and preprocessed array, or the raw bytes if decoding is not possible."""
+    try:
+        image, info = preprocess(data, cfg)
+    except Exception as e:
+        logger.warning(f"OCR 图片预处理失败，使用原图识别: {e}")
+        return data, {'applied': False}
+    return (data if image is None else image), info
+
+
+def _ocr_extract_text(data, cfg):
+    """Return (text, engine, preprocess_info) according to preferred_engine; no cross-engine fallback when set."""
     preferred = (cfg.get('preferred_engine') or '').lower()
 
-    # PaddleOCR only when preferred
-    if preferred == 'paddleocr':
-        if PADDLE_OCR_AVAILABLE and PaddleOCR is not None:
-            try:
-                pcfg = cfg.get('paddleocr', {})
-                lang = pcfg.get('lang', 'ch')
-                use_angle_cls = pcfg.get('use_angle_cls', True)
-                ocr_args = pcfg.get('ocr', {}) or {}
-                det = ocr_args.get('det', True)
-                rec = ocr_args.get('rec', True)
-                cls = ocr_args.get('cls', True)
-
-                reader = PaddleOCR(use_angle_cls=use_angle_cls, lang=lang)
-                result = reader.ocr(save_path, det=det, rec=rec, cls=cls)
-
-                lines = []
-                if isinstance(result, list):
-                    for img_res in result:
-                        if isinstance(img_res, list):
-                            for item in img_res:
-                                try:
-                                    txt = item[1][0] if isinstance(item[1], (list, tuple)) else None
-                                    if txt:
-                                        lines.append(str(txt))
-                                except Exception:
-                                    pass
-                text = '\n'.join(lines).strip()
-                return text, 'paddleocr'
-            except Exception:
-                pass
-        return '', 'none'
-
-    return '', 'none'
+    # PaddleOCR only when preferred; the model instance is reused (see ocr_engine)
+    if preferred == 'paddleocr' and PADDLE_OCR_AVAILABLE:
+        # 上传内容在内存中解码一次后直接交给引擎，不经磁盘读回
+        image, info = _preprocess(data, cfg)
+        try:
+            lines = registry.recognize(image, cfg)
+            return '\n'.join(lines).strip(), 'paddleocr', info
+        except Exception as e:
+            registry.record_error(e)
+            logger.error(f"OCR 识别失败: {e}")
+    return '', 'none', {'applied': False}
+
+
+def recognize_idcard(data, cfg):
+    """识别身份证图片（上传的原始字节）并提取字段（API 进程与 OCR 进程池共用）"""
+    text, engine, preprocess_info = _ocr_extract_text(data, cfg)
+    fields = _extract_idcard_fields(text)
+    return {
+        'engine': engine,
+        'text': text,
+        'preprocess': preprocess_info,
+        'cache_hit': False,
+        'fields': {
+            **fields,
+            'id_card_masked': _mask_idcard(fields.get('id_card', '')),
+        },
+    }
 
 
-@ocr_bp.route('/ocr/idcard', methods=['POST'])
-@token_required
-def api_ocr_idcard(current_user):
-    if 'image' not in request.files:
-        return jsonify({'error': '请上传图片文件（字段名 image）'}), 400
-    side = request.form.get('side', 'front')
-    file = request.files['image']
+def _upload_path(side):
     upload_dir = _ensure_upload_dir()
-    filename = datetime.now().strftime('%Y%m%d%H%M%S') + f"_{side}.png"
-    save_path = os.path.join(upload_dir, filename)
-    file.save(save_path)
+    # 精确到微秒，避免同一秒内的多次上传互相覆盖
+    filename = datetime.now().strftime('%Y%m%d%H%M%S%f') + f"_{side}.png"
+    return os.path.join(upload_dir, filename)
 
-    cfg = _load_ocr_config()
-    preferred = (cfg.get('preferred_engine') or '').lower()
-    if not PADDLE_OCR_AVAILABLE:
-        return jsonify({'error': '服务器未安装 PaddleOCR（请先 pip install paddleocr）'}), 501
 
-    text, engine = _ocr_extract_text(save_path, cfg)
-    fields = _extract_idcard_fields(text)
+def _write_upload(save_path, data):
+    with open(save_path, 'wb') as f:
+        f.write(data)
+
 
+def _save_upload(data, side):
+    save_path = _upload_path(side)
+    _write_upload(save_path, data)
+    return save_path
+
+
+def _save_upload_async(data, side):
+    """Start writing the upload in the background; returns (path, future)."""
+    save_path = _upload_path(side)
+    return save_path, _upload_writer.submit(_write_upload, save_path, data)
+
+
+def _save_failed(saving):
+    """Wait for a background save; an error response if it failed, else ``None``."""
+    try:
+        saving.result()
+    except OSError as e:
+        logger.error(f"身份证图片保存失败: {e}")
+        return jsonify({'error': '图片保存失败'}), 500
+    return None
+
+
+def _cached_result(conn, data, digest, side, cfg):
+    """Return (result, image path) for a repeat upload, or (None, None) on a miss.
+
+    The image saved with the cached result is reused; a new file is written
+    only if it has been deleted since.
+    """
+    cached = ocr_cache.lookup(conn, digest, cfg)
+    if cached is None:
+        return None, None
+    image_path = cached.pop('image_path')
+    if not image_path or not os.path.exists(image_path):
+        image_path = _save_upload(data, side)
+    return {**cached, 'cache_hit': True}, image_path
+
+
+def _static_url(save_path):
     # 构建静态资源 URL
     rel = save_path.replace(os.path.dirname(__file__), '')
-    static_url = request.host_url.rstrip('/') + '/static' + rel.replace('\\', '/').replace('/static', '')
+    return request.host_url.rstrip('/') + '/static' + rel.replace('\\', '/').replace('/static', '')
+
 
+def _log_result(result, side, static_url):
     # 记录识别日志（脱敏处理，仅打印片段）
     try:
-        snippet = (text or '').replace('\n', ' ')[:300]
+        fields = result.get('fields') or {}
+        snippet = (result.get('text') or '').replace('\n', ' ')[:300]
         current_app.logger.info(
             "OCR engine=%s side=%s name=%s id_card=%s text_snippet=%s image=%s",
-            engine,
+            result.get('engine'),
             side,
             fields.get('name', ''),
-            _mask_idcard(fields.get('id_card', '')),
+            fields.get('id_card_masked', ''),
             snippet,
             static_url,
         )
     except Exception:
         pass
 
+
+def _queue_full(conn, pool):
+    return ocr_jobs.queue_depth(conn) >= pool.get('max_queue', 20)
+
+
+def _queue_full_response():
+    response = jsonify({'error': '识别任务排队已满，请稍后重试'})
+    response.headers['Retry-After'] = '5'
+    return response, 429
+
+
+def _enqueue_upload(conn, data, digest, side, username, pool):
+    """Queue the upload for the OCR pool; returns ``(job_id, None)`` or ``(None, error response)``."""
+    if _queue_full(conn, pool):
+        return None, _queue_full_response()
+    # 原图写完后再入队：任务行只记录路径，进程池从该文件读取图片
+    try:
+        save_path = _save_upload(data, side)
+    except OSError as e:
+        logger.error(f"身份证图片保存失败: {e}")
+        return None, (jsonify({'error': '图片保存失败'}), 500)
+    return ocr_jobs.enqueue(conn, side, save_path, username, digest), None
+
+
+def _submit_job(conn, data, digest, side, username, pool):
+    """Queue the upload for the OCR pool; returns the 202 response (or 429/500)."""
+    job_id, error = _enqueue_upload(conn, data, digest, side, username, pool)
+    if error:
+        return error
+    response = jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'queue_position': ocr_jobs.queue_position(conn, job_id),
+    })
+    response.headers['Location'] = f'/api/ocr/jobs/{job_id}'
+    response.headers['Retry-After'] = str(POLL_INTERVAL)
+    return response, 202
+
+
+def _wait_for_job(conn, job_id, timeout):
+    """Wait until the job ends (or ``timeout`` seconds pass); returns the job, ``None`` if it vanished."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        # 等待期间只查询状态列，结束后再读取完整任务
+        status = ocr_jobs.statuses(conn, [job_id]).get(job_id)
+        if status is None or status in ocr_jobs.TERMINAL:
+            break
+        time.sleep(WAIT_INTERVAL)
+    return ocr_jobs.get_job(conn, job_id)
+
+
+def _job_response(job):
+    body = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'side': job['side'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error'],
+    }
+    if job['status'] == 'done' and job['result']:
+        body.update(job['result'])
+        body['image_url'] = _static_url(job['image_path'])
+    return body
+
+
+def _wants_async():
+    value = request.args.get('async') or request.form.get('async') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
+@ocr_bp.route('/ocr/idcard', methods=['POST'])
+@token_required
+def api_ocr_idcard(current_user):
+    if 'image' not in request.files:
+        return jsonify({'error': '请上传图片文件（字段名 image）'}), 400
+    side = request.form.get('side', 'front')
+    cfg = load_config()
+    pool = cfg.get('worker_pool') or {}
+    data = request.files['image'].read()
+    digest = ocr_cache.content_hash(data)
+
+    conn = connect()
+    try:
+        # 同一张图片重复上传时直接返回缓存的识别结果
+        result, save_path = _cached_result(conn, data, digest, side, cfg)
+        if result is None and pool.get('enabled') and ocr_jobs.pool_alive():
+            if _wants_async():
+                # async=1：不等待识别结果，返回 202 由客户端轮询任务
+                return _submit_job(conn, data, digest, side, current_user['username'], pool)
+            # 进程池运行时同样交给 ocr_worker 识别，本进程只等待结果，响应格式不变
+            job_id, error = _enqueue_upload(conn, data, digest, side, current_user['username'], pool)
+            if error:
+                return error
+            job = _wait_for_job(conn, job_id, min(pool.get('job_timeout', 60) + 5, SYNC_WAIT_MAX))
+            if job is None:
+                return jsonify({'error': '识别任务已被删除', 'job_id': job_id}), 500
+            if job['status'] not in ocr_jobs.TERMINAL:
+                # 等待已到上限：任务继续执行，客户端可按 job_id 查询，结果也会写入缓存供重新上传命中
+                response = jsonify({'error': f'识别未在 {SYNC_WAIT_MAX} 秒内完成，请稍后查询任务', 'job_id': job_id,
+                                    'status': job['status']})
+                response.headers['Location'] = f'/api/ocr/jobs/{job_id}'
+                response.headers['Retry-After'] = str(POLL_INTERVAL)
+                return response, 504
+            if job['status'] != 'done':
+                status = 500 if job['status'] == 'failed' else 504
+                return jsonify({'error': job['error'] or '识别未完成', 'job_id': job_id, 'status': job['status']}), status
+            result, save_path = job['result'], job['image_path']
+        elif result is None:
+            if not PADDLE_OCR_AVAILABLE:
+                return jsonify({'error': '服务器未安装 PaddleOCR（请先 pip install paddleocr）'}), 501
+            save_path, saving = _save_upload_async(data, side)
+            result = recognize_idcard(data, cfg)
+            # 返回前确认原图已写入，image_url 立即可用
+            failed = _save_failed(saving)
+            if failed:
+                return failed
+            ocr_cache.store(conn, digest, cfg, result, save_path, current_user['username'])
+    finally:
+        conn.close()
+
+    static_url = _static_url(save_path)
+    _log_result(result, side, static_url)
+    return jsonify({**result, 'image_url': static_url})
+
+
+@ocr_bp.route('/ocr/jobs', methods=['POST'])
+@token_required
+def api_create_ocr_job(current_user):
+    """提交身份证识别任务，由 OCR 进程池异步处理，返回任务 ID"""
+    if 'image' not in request.files:
+        return jsonify({'error': '请上传图片文件（字段名 image）'}), 400
+    cfg = load_config()
+    pool = cfg.get('worker_pool') or {}
+    if not pool.get('enabled'):
+        return jsonify({'error': '未启用 OCR 进程池（ocr_config.json 中的 worker_pool.enabled）'}), 503
+    if not ocr_jobs.pool_alive():
+        return jsonify({'error': 'OCR 进程池未运行（python ocr_worker.py）'}), 503
+    side = request.form.get('side', 'front')
+    data = request.files['image'].read()
+    digest = ocr_cache.content_hash(data)
+
+    conn = connect()
+    try:
+        result, image_path = _cached_result(conn, data, digest, side, cfg)
+        if result is not None:
+            # 命中缓存：直接记录为已完成的任务并返回结果
+            job_id = ocr_jobs.record_done(conn, side, image_path, current_user['username'], digest, result)
+            return jsonify(_job_response(ocr_jobs.get_job(conn, job_id)))
+        return _submit_job(conn, data, digest, side, current_user['username'], pool)
+    finally:
+        conn.close()
+
+
+@ocr_bp.route('/ocr/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def api_get_ocr_job(current_user, job_id):
+    """查询识别任务（立即返回）；未结束时按 Retry-After 间隔再次查询"""
+    conn = connect()
+    job = ocr_jobs.get_job(conn, job_id)
+    conn.close()
+    if job is None:
+        # 任务不存在或已按 keep_days 清理
+        return jsonify({'error': f'识别任务 {job_id} 不存在'}), 404
+    body = _job_response(job)
+    if body['status'] == 'done':
+        _log_result(job['result'], job['side'], body['image_url'])
+    response = jsonify(body)
+    if job['status'] not in ocr_jobs.TERMINAL:
+        response.headers['Retry-After'] = str(POLL_INTERVAL)
+    return response
+
+
+@ocr_bp.route('/ocr/jobs/<int:job_id>/cancel', methods=['POST'])
+@token_required
+def api_cancel_ocr_job(current_user, job_id):
+    conn = connect()
+    cancelled = ocr_jobs.cancel(conn, job_id)
+    job = ocr_jobs.get_job(conn, job_id)
+    conn.close()
+    if job is None:
+        return jsonify({'error': f'识别任务 {job_id} 不存在'}), 404
+    if not cancelled:
+        return jsonify({'error': f"识别任务 {job_id} 已结束（{job['status']}）"}), 409
+    return jsonify({'message': f'识别任务 {job_id} 已取消', 'status': job['status']})
+
+
+@ocr_bp.route('/ocr/health', methods=['GET'])
+def api_ocr_health():
+    """OCR 引擎状态：是否可用、模型是否已加载且与当前配置一致"""
+    cfg = load_config()
+    stats = registry.stats()
+    current = stats['engine_key'] == engine_key(cfg)
     return jsonify({
-        'engine': engine,
-        'text': text,
-        'fields': {
-            **fields,
-            'id_card_masked': _mask_idcard(fields.get('id_card', '')),
+        'status': 'ok' if stats['available'] else 'unavailable',
+        'available': stats['available'],
+        'loaded': stats['loaded'] and current,
+        'engine_key': engine_key(cfg),
+        'loaded_at': stats['loaded_at'] if current else None,
+        'last_load_seconds': stats['last_load_seconds'],
+        'worker_pool': {
+            'enabled': bool((cfg.get('worker_pool') or {}).get('enabled')),
+            'running': ocr_jobs.pool_alive(),
         },
-        'image_url': static_url,
-    })
\ No newline at end of file
+    }), 200 if stats['available'] else 503
@@ -0,0 +1,122 @@
+"""Recognition results cached by upload content, in the ``ocr_cache`` table.
+
+A re-uploaded photo has the same bytes, so its SHA-256 (``content_hash``)
+together with the fingerprint of every setting that affects the result
+(``result_key``: engine, call arguments and ``preprocess``) identifies a
+previous recognition. A hit returns the stored text and fields without
+running OCR. Changing any of those settings simply starts a new set of
+entries. The table keeps at most ``cache.max_entries`` rows (least recently
+used are dropped first), and each row records which upload produced it and
+how often it was reused.
+"""
+import hashlib
+import json
+import threading
+
+from common import connect
+from ocr_engine import engine_key, fingerprint
+
+
+# 每写入这么多次清理一次超额条目
+PRUNE_EVERY = 50
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0}
+_stores = 0
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _settings(cfg):
+    return cfg.get('cache') or {}
+
+
+def enabled(cfg):
+    return bool(_settings(cfg).get('enabled'))
+
+
+def result_key(cfg):
+    """Fingerprint of the settings a recognition result depends on."""
+    pcfg = cfg.get('paddleocr', {}) or {}
+    return fingerprint({
+        'engine': (cfg.get('preferred_engine') or '').lower(),
+        'model': engine_key(cfg),
+        'ocr': pcfg.get('ocr') or {},
+        'preprocess': cfg.get('preprocess') or {},
+    })
+
+
+def lookup(conn, digest, cfg):
+    """Stored result for ``digest`` under the current settings, or ``None``; counts the hit."""
+    if not enabled(cfg):
+        return None
+    key = result_key(cfg)
+    row = conn.execute(
+        "SELECT id, result, image_path FROM ocr_cache WHERE content_hash = ? AND config_key = ?", (digest, key)
+    ).fetchone()
+    if row is None:
+        _count('misses')
+        return None
+    conn.execute(
+        "UPDATE ocr_cache SET hits = hits + 1, last_used_at = datetime('now') WHERE id = ?", (row[0],)
+    )
+    conn.commit()
+    _count('hits')
+    result = json.loads(row[1])
+    result['image_path'] = row[2]
+    return result
+
+
+def store(conn, digest, cfg, result, image_path, created_by=None):
+    """Remember a successful recognition; results from a failed engine run are not cached."""
+    global _stores
+    if not digest or not enabled(cfg) or result.get('engine') != 'paddleocr':
+        return
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO ocr_cache (content_hash, config_key, result, image_path, created_by)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (digest, result_key(cfg), json.dumps(result, ensure_ascii=False), image_path, created_by),
+    )
+    conn.commit()
+    _count('stores')
+    with _lock:
+        _stores += 1
+        due = _stores % PRUNE_EVERY == 0
+    if due:
+        prune(conn, _settings(cfg).get('max_entries', 5000))
+
+
+def prune(conn, max_entries):
+    """Keep the ``max_entries`` most recently used rows; returns the number deleted."""
+    cursor = conn.execute(
+        """
+        DELETE FROM ocr_cache WHERE id IN (
+            SELECT id FROM ocr_cache ORDER BY last_used_at DESC, id DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (int(max_entries),),
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def stats():
+    """This process's hit/miss counts and the table size (``/api/metrics``)."""
+    conn = connect()
+    try:
+        entries = conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+    finally:
+        conn.close()
+    with _lock:
+        counts = dict(_stats)
+    lookups = counts['hits'] + counts['misses']
+    return {**counts, 'entries': entries, 'hit_rate': round(counts['hits'] / lookups, 3) if lookups else None}
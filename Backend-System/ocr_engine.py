@@ -0,0 +1,209 @@
+"""PaddleOCR engines shared across requests.
+
+Building a ``PaddleOCR`` instance loads the detection, angle-classification
+and recognition models from disk, which takes seconds. ``registry`` keeps
+one instance per process, keyed by the constructor settings in
+``config/ocr_config.json`` (``engine_key``): it is built on first use, or at
+worker start when ``"warmup": true`` (see ``gunicorn.conf.py``), and rebuilt
+only when those settings change. Call arguments such as ``ocr.det`` are read
+on every request and never trigger a reload. Load and inference counters
+feed ``GET /api/ocr/health`` and ``GET /api/metrics``.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+# PaddleOCR availability detection
+try:
+    from paddleocr import PaddleOCR
+    PADDLE_OCR_AVAILABLE = True
+except Exception:
+    PADDLE_OCR_AVAILABLE = False
+    PaddleOCR = None
+
+
+logger = logging.getLogger('ocr_engine')
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'ocr_config.json')
+
+DEFAULT_CONFIG = {
+    "preferred_engine": "paddleocr",
+    "warmup": False,
+    "paddleocr": {
+        "lang": "ch",
+        "use_angle_cls": True,
+        "ocr": {
+            "det": True,
+            "rec": True,
+            "cls": True
+        }
+    },
+    # 识别前的图片预处理（ocr_preprocess.py）；默认关闭，与旧版行为一致
+    "preprocess": {
+        "enabled": False,
+        "exif_orientation": True,
+        "crop_card": True,
+        "crop_min_area": 0.2,
+        "max_side": 1600,
+        "grayscale": False,
+        "contrast": None
+    },
+    # 按上传内容哈希缓存识别结果（ocr_cache.py）
+    "cache": {
+        "enabled": False,
+        "max_entries": 5000
+    },
+    # OCR 进程池（ocr_worker.py）；启用后识别不在 API 进程中执行
+    "worker_pool": {
+        "enabled": False,
+        "processes": 2,
+        "job_timeout": 60,
+        "max_queue": 20,
+        "max_rss_mb": 2048,
+        "poll_interval": 0.2,
+        "keep_days": 7
+    },
+}
+
+
+def _deep_update(dst, src):
+    for k, v in src.items():
+        if isinstance(v, dict) and isinstance(dst.get(k), dict):
+            _deep_update(dst[k], v)
+        else:
+            dst[k] = v
+    return dst
+
+
+def load_config():
+    """Effective OCR settings: ``config/ocr_config.json`` over ``DEFAULT_CONFIG`` (re-read on every call)."""
+    default = json.loads(json.dumps(DEFAULT_CONFIG))
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            return _deep_update(default, json.load(f))
+    except Exception:
+        return default
+
+
+def fingerprint(value):
+    """Short stable hash of a JSON-serializable value."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def engine_key(cfg):
+    """Fingerprint of the settings a ``PaddleOCR`` instance is built with."""
+    pcfg = cfg.get('paddleocr', {}) or {}
+    return fingerprint({'lang': pcfg.get('lang', 'ch'), 'use_angle_cls': pcfg.get('use_angle_cls', True)})
+
+
+def _result_lines(result):
+    lines = []
+    if isinstance(result, list):
+        for img_res in result:
+            if isinstance(img_res, list):
+                for item in img_res:
+                    try:
+                        txt = item[1][0] if isinstance(item[1], (list, tuple)) else None
+                        if txt:
+                            lines.append(str(txt))
+                    except Exception:
+                        pass
+    return lines
+
+
+class EngineRegistry:
+    """The process's current PaddleOCR instance and its load/inference counters."""
+
+    def __init__(self):
+        # PaddleOCR 实例不是线程安全的：构建与推理都在同一把锁内进行
+        self._lock = threading.Lock()
+        self._engine = None
+        self._key = None
+        self.loaded_at = None
+        self.loads = 0
+        self.last_load_seconds = None
+        self.inferences = 0
+        self.inference_seconds = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    def _engine_for(self, cfg):
+        key = engine_key(cfg)
+        if self._engine is None or self._key != key:
+            pcfg = cfg.get('paddleocr', {}) or {}
+            # 先释放旧实例，避免新旧模型同时占用内存
+            self._engine = None
+            start = time.perf_counter()
+            self._engine = PaddleOCR(use_angle_cls=pcfg.get('use_angle_cls', True), lang=pcfg.get('lang', 'ch'))
+            self.last_load_seconds = round(time.perf_counter() - start, 3)
+            self._key = key
+            self.loaded_at = datetime.now().isoformat(timespec='seconds')
+            self.loads += 1
+            logger.info("PaddleOCR 模型已加载（配置 %s，耗时 %ss）", key, self.last_load_seconds)
+        return self._engine
+
+    def load(self, cfg):
+        """Build the engine for ``cfg`` now unless it is already loaded."""
+        with self._lock:
+            self._engine_for(cfg)
+
+    def recognize(self, image, cfg):
+        """Run OCR on ``image`` (file path or image array); returns the recognized lines."""
+        ocr_args = (cfg.get('paddleocr', {}) or {}).get('ocr', {}) or {}
+        with self._lock:
+            engine = self._engine_for(cfg)
+            start = time.perf_counter()
+            result = engine.ocr(
+                image,
+                det=ocr_args.get('det', True),
+                rec=ocr_args.get('rec', True),
+                cls=ocr_args.get('cls', True),
+            )
+            self.inference_seconds += time.perf_counter() - start
+            self.inferences += 1
+        return _result_lines(result)
+
+    def record_error(self, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = str(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'available': PADDLE_OCR_AVAILABLE,
+                'loaded': self._engine is not None,
+                'engine_key': self._key,
+                'loaded_at': self.loaded_at,
+                'loads': self.loads,
+                'last_load_seconds': self.last_load_seconds,
+                'inferences': self.inferences,
+                'avg_inference_ms': round(self.inference_seconds * 1000 / self.inferences, 1)
+                if self.inferences else None,
+                'errors': self.errors,
+                'last_error': self.last_error,
+            }
+
+
+registry = EngineRegistry()
+
+
+def warmup(cfg=None):
+    """Load the engine ahead of the first scan when the config sets ``"warmup": true``."""
+    cfg = cfg or load_config()
+    if not cfg.get('warmup') or not PADDLE_OCR_AVAILABLE:
+        return False
+    if (cfg.get('preferred_engine') or '').lower() != 'paddleocr':
+        return False
+    try:
+        registry.load(cfg)
+        return True
+    except Exception as e:
+        registry.record_error(e)
+        logger.error(f"PaddleOCR 预加载失败: {e}")
+        return False
@@ -0,0 +1,237 @@
+"""Queue of OCR jobs in the ``ocr_jobs`` table.
+
+The API enqueues uploads (``enqueue``) and polls them (``get_job``); the
+``ocr_worker.py`` process pool claims queued jobs in id order
+(``claim_next``) and writes results back (``finish``). A job ends as
+``done``, ``failed``, ``cancelled`` or ``timeout``. ``finish`` only updates a
+job that is still running, so a result that arrives after a cancel or a
+timeout is dropped. Rows hold metadata only: the API finishes writing the
+upload to ``image_path`` before queueing, and the worker reads it from there.
+"""
+import json
+import os
+import time
+
+from common import BASE_DIR, connect
+
+
+TERMINAL = ('done', 'failed', 'cancelled', 'timeout')
+
+# 进程异常退出时任务最多重试的次数
+MAX_ATTEMPTS = 2
+
+# ocr_worker 主进程定期更新该文件的修改时间，API 据此判断进程池是否在运行
+HEARTBEAT_PATH = os.path.join(BASE_DIR, 'sql', 'ocr_worker.heartbeat')
+HEARTBEAT_STALE = 10
+
+_JOB_COLUMNS = [
+    'id', 'status', 'side', 'image_path', 'created_by', 'created_at', 'started_at', 'finished_at',
+    'worker_pid', 'attempts', 'result', 'error', 'content_hash',
+]
+
+
+def heartbeat():
+    with open(HEARTBEAT_PATH, 'a'):
+        os.utime(HEARTBEAT_PATH)
+
+
+def pool_alive():
+    try:
+        return time.time() - os.path.getmtime(HEARTBEAT_PATH) < HEARTBEAT_STALE
+    except OSError:
+        return False
+
+
+def queue_depth(conn):
+    return conn.execute("SELECT COUNT(*) FROM ocr_jobs WHERE status = 'queued'").fetchone()[0]
+
+
+def enqueue(conn, side, image_path, created_by=None, content_hash=None):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO ocr_jobs (side, image_path, created_by, content_hash) VALUES (?, ?, ?, ?)",
+        (side, image_path, created_by, content_hash),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def record_done(conn, side, image_path, created_by, content_hash, result):
+    """Insert a job that is already finished (result served from ``ocr_cache``)."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO ocr_jobs (status, side, image_path, created_by, content_hash, result, started_at, finished_at)
+        VALUES ('done', ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+        """,
+        (side, image_path, created_by, content_hash, json.dumps(result, ensure_ascii=False)),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def get_job(conn, job_id):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM ocr_jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    job = dict(zip(_JOB_COLUMNS, row))
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def queue_position(conn, job_id):
+    """Number of queued jobs ahead of ``job_id`` plus one."""
+    row = conn.execute(
+        "SELECT COUNT(*) FROM ocr_jobs WHERE status = 'queued' AND id <= ?", (job_id,)
+    ).fetchone()
+    return row[0]
+
+
+def cancel(conn, job_id):
+    """Cancel a queued or running job; True if it was still pending."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE ocr_jobs SET status = 'cancelled', finished_at = datetime('now')
+        WHERE id = ? AND status IN ('queued', 'running')
+        """,
+        (job_id,),
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def claim_next(conn, worker_pid):
+    """Mark the oldest queued job as running for ``worker_pid`` and return it (``None`` if idle).
+
+    ``started_at`` keeps milliseconds: the pool measures ``job_timeout`` from it.
+    """
+    while True:
+        # 空闲轮询只读：队列为空时不获取数据库写锁
+        row = conn.execute("SELECT id FROM ocr_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if not row:
+            return None
+        cursor = conn.execute(
+            """
+            UPDATE ocr_jobs
+            SET status = 'running', started_at = strftime('%Y-%m-%d %H:%M:%f', 'now'), worker_pid = ?, attempts = attempts + 1
+            WHERE id = ? AND status = 'queued'
+            """,
+            (worker_pid, row[0]),
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            break
+        # 被其他进程抢先领取（或已取消）：查找下一个
+    return get_job(conn, row[0])
+
+
+def finish(conn, job_id, result=None, error=None):
+    """Store the outcome of a running job; ignored if it was cancelled or timed out meanwhile."""
+    conn.execute(
+        """
+        UPDATE ocr_jobs SET status = ?, result = ?, error = ?, finished_at = datetime('now')
+        WHERE id = ? AND status = 'running'
+        """,
+        ('failed' if error else 'done', json.dumps(result, ensure_ascii=False) if result is not None else None,
+         error, job_id),
+    )
+    conn.commit()
+
+
+def mark(conn, job_id, status, error):
+    """End a running job as ``status`` (``timeout``/``failed``) from the pool supervisor."""
+    conn.execute(
+        """
+        UPDATE ocr_jobs SET status = ?, error = ?, finished_at = datetime('now')
+        WHERE id = ? AND status = 'running'
+        """,
+        (status, error, job_id),
+    )
+    conn.commit()
+
+
+def retry_or_fail(conn, job_id, error):
+    """A worker died while running the job: queue it again, or fail it after ``MAX_ATTEMPTS``."""
+    conn.execute(
+        """
+        UPDATE ocr_jobs
+        SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+            error = CASE WHEN attempts < ? THEN NULL ELSE ? END,
+            finished_at = CASE WHEN attempts < ? THEN NULL ELSE datetime('now') END,
+            worker_pid = NULL
+        WHERE id = ? AND status = 'running'
+        """,
+        (MAX_ATTEMPTS, MAX_ATTEMPTS, error, MAX_ATTEMPTS, job_id),
+    )
+    conn.commit()
+
+
+def recover(conn):
+    """Startup: jobs left running by a previous pool go back to the queue (or fail). Returns the count."""
+    ids = [r[0] for r in conn.execute("SELECT id FROM ocr_jobs WHERE status = 'running'").fetchall()]
+    for job_id in ids:
+        retry_or_fail(conn, job_id, 'OCR 进程重启，任务中断')
+    return len(ids)
+
+
+def statuses(conn, job_ids):
+    if not job_ids:
+        return {}
+    cursor = conn.execute(
+        f"SELECT id, status FROM ocr_jobs WHERE id IN ({', '.join('?' for _ in job_ids)})", list(job_ids)
+    )
+    return dict(cursor.fetchall())
+
+
+def running_jobs(conn, job_ids):
+    """``{id: (status, seconds since started_at)}`` for ``job_ids`` and every job still marked running."""
+    placeholders = ', '.join('?' for _ in job_ids) or 'NULL'
+    cursor = conn.execute(
+        f"""
+        SELECT id, status, (julianday('now') - julianday(started_at)) * 86400
+        FROM ocr_jobs WHERE status = 'running' OR id IN ({placeholders})
+        """,
+        list(job_ids),
+    )
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+
+def prune(conn, keep_days):
+    """Delete finished jobs older than ``keep_days`` (uploaded images are kept)."""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        DELETE FROM ocr_jobs
+        WHERE status IN ({', '.join('?' for _ in TERMINAL)}) AND finished_at < datetime('now', ?)
+        """,
+        (*TERMINAL, f'-{int(keep_days)} days'),
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def stats():
+    """Job counts by status and the last hour's average wait and run time (``/api/metrics``)."""
+    conn = connect()
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status").fetchall())
+        row = conn.execute(
+            """
+            SELECT COUNT(*),
+                   AVG((julianday(started_at) - julianday(created_at)) * 86400),
+                   AVG((julianday(finished_at) - julianday(started_at)) * 86400)
+            FROM ocr_jobs
+            WHERE status = 'done' AND finished_at >= datetime('now', '-1 hour')
+            """
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        'by_status': counts,
+        'done_last_hour': row[0],
+        'avg_wait_seconds': round(row[1], 2) if row[1] is not None else None,
+        'avg_run_seconds': round(row[2], 2) if row[2] is not None else None,
+    }
@@ -0,0 +1,172 @@
+"""Image preprocessing applied before PaddleOCR inference.
+
+PaddleOCR's detection time grows with pixel count, and phone photos of an ID
+card are often 12MP with the card filling only part of the frame. The
+pipeline settings come from ``preprocess`` in ``config/ocr_config.json``. It
+runs these steps in order, and each one can be switched off:
+
+1. ``exif_orientation``: rotate the image as its EXIF tag says. OpenCV does
+   this while decoding unless ``IMREAD_IGNORE_ORIENTATION`` is set.
+2. ``crop_card``: find the card's outline on a small copy of the image and
+   warp that quadrilateral out of the full-resolution image. If no card-like
+   outline is found, the whole image is kept.
+3. ``max_side``: shrink the result so its longest side is at most this many
+   pixels.
+4. ``grayscale`` / ``contrast``: convert to gray, then ``"clahe"`` (local
+   contrast) or ``"stretch"`` (min-max normalize).
+
+``preprocess`` takes the uploaded bytes and decodes them once. It returns
+the image array that is passed to the engine, plus a summary of what was
+done.
+"""
+import time
+
+# OpenCV availability detection（随 paddleocr 一同安装 opencv-python-headless）
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except Exception:
+    cv2 = None
+    np = None
+    CV2_AVAILABLE = False
+
+
+# 身份证 85.6mm × 54mm
+CARD_ASPECT = 85.6 / 54
+# 轮廓检测使用的缩略图最长边（像素）
+DETECT_SIDE = 800
+
+
+def decode(data, cfg):
+    """Decode image bytes as a BGR array, applying EXIF orientation unless disabled; ``None`` if undecodable."""
+    flags = cv2.IMREAD_COLOR
+    if not cfg.get('exif_orientation', True):
+        flags |= cv2.IMREAD_IGNORE_ORIENTATION
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    return cv2.imdecode(buf, flags)
+
+
+def read_image(path, cfg):
+    """``decode`` the file at ``path``."""
+    with open(path, 'rb') as f:
+        return decode(f.read(), cfg)
+
+
+def _order_corners(pts):
+    """Corners as top-left, top-right, bottom-right, bottom-left."""
+    pts = pts.reshape(4, 2).astype('float32')
+    s = pts.sum(axis=1)
+    d = np.diff(pts, axis=1).ravel()
+    return np.array([pts[np.argmin(s)], pts[np.argmin(d)], pts[np.argmax(s)], pts[np.argmax(d)]], dtype='float32')
+
+
+def find_card(image, min_area=0.2, aspect_tolerance=0.25):
+    """Corners of the largest card-shaped quadrilateral in ``image`` (ordered, full-resolution), or ``None``."""
+    h, w = image.shape[:2]
+    scale = min(1.0, DETECT_SIDE / max(h, w))
+    small = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) if scale < 1 else image
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(gray, 50, 150)
+    edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5)))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    area_limit = min_area * small.shape[0] * small.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < area_limit:
+            break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) != 4 or not cv2.isContourConvex(approx):
+            continue
+        corners = _order_corners(approx) / scale
+        width, height = _card_size(corners)
+        aspect = max(width, height) / max(min(width, height), 1)
+        if abs(aspect - CARD_ASPECT) <= aspect_tolerance * CARD_ASPECT:
+            return corners
+    return None
+
+
+def _card_size(corners):
+    tl, tr, br, bl = corners
+    width = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+    height = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+    return width, height
+
+
+def crop_to_card(image, corners):
+    """Warp the quadrilateral ``corners`` to an upright rectangle."""
+    width, height = (int(round(v)) for v in _card_size(corners))
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype='float32')
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    card = cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_LINEAR)
+    if height > width:
+        # 竖拍的卡片转为横向；若因此上下颠倒，由 use_angle_cls 纠正
+        card = cv2.rotate(card, cv2.ROTATE_90_CLOCKWISE)
+    return card
+
+
+def cap_size(image, max_side):
+    h, w = image.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return image
+    scale = max_side / max(h, w)
+    return cv2.resize(image, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _equalize(channel, contrast):
+    if contrast == 'clahe':
+        return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(channel)
+    if contrast == 'stretch':
+        return cv2.normalize(channel, None, 0, 255, cv2.NORM_MINMAX)
+    return channel
+
+
+def normalize(image, grayscale=False, contrast=None):
+    if grayscale:
+        gray = _equalize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), contrast)
+        # PaddleOCR 检测模型要求三通道输入
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    if contrast:
+        # 保留彩色：只处理 LAB 的亮度通道
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        lab[:, :, 0] = _equalize(lab[:, :, 0], contrast)
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    return image
+
+
+def preprocess(data, cfg):
+    """Decode the image bytes ``data`` and run the pipeline on them.
+
+    Returns ``(image, info)``. With preprocessing disabled ``image`` is just
+    the decoded array. It is ``None`` when OpenCV is missing or the bytes
+    cannot be decoded; the caller then passes the bytes to the engine
+    unchanged.
+    """
+    pcfg = cfg.get('preprocess') or {}
+    if not CV2_AVAILABLE:
+        return None, {'applied': False}
+    start = time.perf_counter()
+    image = decode(data, pcfg)
+    if image is None or not pcfg.get('enabled'):
+        return image, {'applied': False}
+    original = image.shape[1], image.shape[0]
+
+    cropped = False
+    if pcfg.get('crop_card'):
+        corners = find_card(image, pcfg.get('crop_min_area', 0.2))
+        if corners is not None:
+            image = crop_to_card(image, corners)
+            cropped = True
+    image = cap_size(image, pcfg.get('max_side'))
+    image = normalize(image, pcfg.get('grayscale', False), pcfg.get('contrast'))
+
+    return image, {
+        'applied': True,
+        'original_size': list(original),
+        'size': [image.shape[1], image.shape[0]],
+        'cropped': cropped,
+        'ms': round((time.perf_counter() - start) * 1000, 1),
+    }
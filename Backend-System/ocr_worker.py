@@ -0,0 +1,195 @@
+"""OCR process pool fed by the ``ocr_jobs`` queue.
+
+Runs as its own supervisord program (``python ocr_worker.py``), so OCR
+capacity is sized independently of the gunicorn API workers and only these
+processes hold a PaddleOCR model. The supervisor starts
+``worker_pool.processes`` children. Each child loads the engine once
+(``ocr_engine.warmup``), claims queued jobs in id order and writes results
+back. Each child publishes the id of the job it is running, which lets the
+supervisor:
+
+- kill a child whose job exceeds ``job_timeout`` or was cancelled, and mark
+  the job;
+- re-queue the job of a child that crashed (up to ``ocr_jobs.MAX_ATTEMPTS``);
+- start a replacement for every child that exits.
+
+A child exits by itself after a job that leaves its RSS above
+``max_rss_mb``. Settings come from ``worker_pool`` in
+``config/ocr_config.json``.
+"""
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+import ocr_cache
+import ocr_engine
+import ocr_jobs
+from common import connect
+
+
+logger = logging.getLogger('ocr_worker')
+
+# 清理过期任务记录的间隔（秒）
+PRUNE_INTERVAL = 3600
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        # 非 Linux：退而使用峰值 RSS（KB）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child_main(current_job):
+    # 收到 SIGTERM 时直接退出，正在执行的任务由主进程处理
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from ocr_api import recognize_idcard
+
+    pid = os.getpid()
+    cfg = ocr_engine.load_config()
+    ocr_engine.warmup(dict(cfg, warmup=True))
+    conn = connect()
+    try:
+        while True:
+            cfg = ocr_engine.load_config()
+            pool = cfg['worker_pool']
+            job = ocr_jobs.claim_next(conn, pid)
+            if job is None:
+                time.sleep(pool['poll_interval'])
+                continue
+            current_job.value = job['id']
+            try:
+                if not ocr_engine.PADDLE_OCR_AVAILABLE:
+                    raise RuntimeError('服务器未安装 PaddleOCR（请先 pip install paddleocr）')
+                # API 入队前已写完原图；刚写入的文件通常仍在页缓存中
+                with open(job['image_path'], 'rb') as f:
+                    data = f.read()
+                result = recognize_idcard(data, cfg)
+                error = None
+            except Exception as e:
+                logger.error(f"识别任务 {job['id']} 失败: {e}")
+                result, error = None, str(e)
+            # 识别已结束：先撤下任务号，主进程不会再因超时或取消终止本进程（写入结果时模型仍保留）
+            current_job.value = 0
+            ocr_jobs.finish(conn, job['id'], result=result, error=error)
+            if result is not None:
+                ocr_cache.store(conn, job['content_hash'], cfg, result, job['image_path'], job['created_by'])
+            rss = _rss_mb()
+            if rss > pool['max_rss_mb']:
+                logger.info("OCR 进程 %s 内存 %.0fMB 超过 %sMB，退出并由新进程替换", pid, rss, pool['max_rss_mb'])
+                return
+    finally:
+        conn.close()
+
+
+class Pool:
+    """Supervises the OCR child processes."""
+
+    def __init__(self, size):
+        self.size = size
+        self.children = {}  # pid -> (process, current_job)
+        self.stopping = False
+
+    def spawn(self):
+        current_job = multiprocessing.Value('i', 0)
+        process = multiprocessing.Process(target=_child_main, args=(current_job,))
+        process.start()
+        self.children[process.pid] = (process, current_job)
+        logger.info("已启动 OCR 进程 %s", process.pid)
+
+    def _kill(self, pid):
+        process = self.children[pid][0]
+        process.kill()
+        process.join()
+
+    def _busy(self, pid, job_id):
+        """Whether child ``pid`` is still running ``job_id`` (it clears the id before writing the result)."""
+        return self.children[pid][1].value == job_id
+
+    def check(self, conn, job_timeout):
+        """One supervision pass: timeouts, cancellations, exited children."""
+        running = {}
+        for pid, (process, current_job) in self.children.items():
+            if current_job.value:
+                running[current_job.value] = pid
+
+        # 超时按任务的 started_at 计算；也覆盖已无进程执行、仍标记为 running 的任务
+        for job_id, (status, elapsed) in ocr_jobs.running_jobs(conn, running).items():
+            pid = running.get(job_id)
+            if status == 'cancelled':
+                if pid and self._busy(pid, job_id):
+                    logger.info("识别任务 %s 已取消，终止 OCR 进程 %s", job_id, pid)
+                    self._kill(pid)
+            elif status == 'running' and elapsed is not None and elapsed > job_timeout:
+                ocr_jobs.mark(conn, job_id, 'timeout', f'识别超过 {job_timeout} 秒未完成')
+                if pid and self._busy(pid, job_id):
+                    logger.warning("识别任务 %s 超过 %s 秒，终止 OCR 进程 %s", job_id, job_timeout, pid)
+                    self._kill(pid)
+                else:
+                    logger.warning("识别任务 %s 超过 %s 秒，标记为超时", job_id, job_timeout)
+
+        for pid, (process, current_job) in list(self.children.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            if current_job.value:
+                # 进程在任务执行中退出（崩溃或被终止）：超时/取消已有状态，其余重新排队
+                ocr_jobs.retry_or_fail(conn, current_job.value, f'OCR 进程异常退出（exitcode={process.exitcode}）')
+            del self.children[pid]
+            if not self.stopping:
+                self.spawn()
+
+    def stop(self):
+        self.stopping = True
+        for pid, (process, _) in self.children.items():
+            process.terminate()
+        for pid, (process, _) in self.children.items():
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+
+
+def run():
+    cfg = ocr_engine.load_config()
+    pool_cfg = cfg['worker_pool']
+    conn = connect()
+    recovered = ocr_jobs.recover(conn)
+    if recovered:
+        logger.info("重新排队上次中断的识别任务 %s 个", recovered)
+
+    pool = Pool(max(1, int(pool_cfg['processes'])))
+    for _ in range(pool.size):
+        pool.spawn()
+
+    def handle_term(signum, frame):
+        pool.stopping = True
+    signal.signal(signal.SIGTERM, handle_term)
+    signal.signal(signal.SIGINT, handle_term)
+
+    last_prune = 0
+    try:
+        while not pool.stopping:
+            pool_cfg = ocr_engine.load_config()['worker_pool']
+            pool.check(conn, pool_cfg['job_timeout'])
+            ocr_jobs.heartbeat()
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                ocr_jobs.prune(conn, pool_cfg['keep_days'])
+                last_prune = time.monotonic()
+            time.sleep(0.5)
+    finally:
+        pool.stop()
+        conn.close()
+        logger.info("OCR 进程池已停止")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run()
@@ -5,63 +5,144 @@ from flask import Blueprint, request, jsonify
 
 from auth_api import token_required
 from common import connect
+from conditional import conditional_get
+from response_cache import invalidates
+from streaming import stream_page
+from listing import (
+    FieldSet, Filters, ListQueryError, limit_clause, order_by, page_rows, parse_flag, parse_limit,
+)
 
 
 repair_bp = Blueprint('repair_records', __name__, url_prefix='/api')
 
 
+# 列表排序键：报修日期倒序，同日按记录 ID 倒序
+REPAIR_SORT = ["COALESCE(report_date, '')", 'id']
+
+
+# fields= 可选字段；未传时返回全部列（与原接口一致），表格视图可用 fields= 省去描述、备注等长文本
+REPAIR_FIELDS = FieldSet(
+    [
+        ('id', 'id'), ('building', 'building'), ('room_no', 'room_no'), ('repair_type', 'repair_type'),
+        ('description', 'description'), ('report_date', 'report_date'), ('report_by', 'report_by'),
+        ('status', 'status'), ('repair_date', 'repair_date'), ('repair_cost', 'repair_cost'),
+        ('repair_person', 'repair_person'), ('remarks', 'remarks'),
+    ],
+    required=['report_date', 'id'],
+)
+
+REPAIR_DETAIL_FIELDS = FieldSet(REPAIR_FIELDS.columns.items())
+
+# 分面统计的维度：统计某一维度时忽略该维度自身的筛选条件，便于切换
+REPAIR_FACETS = ('status', 'repair_type')
+
+
+def repair_filters(args, exclude=()):
+    """维修记录的筛选条件（列表、查询接口与导出共用）；``exclude`` 中的字段不参与筛选"""
+    filters = Filters()
+    for column in ('status', 'repair_type', 'building', 'room_no', 'repair_person'):
+        if column not in exclude:
+            filters.equal(column, args.get(column))
+    filters.date_range('report_date', args.get('date_from'), args.get('date_to'))
+    return filters
+
+
+def _repair_page(filters, default_limit=None, total=None, **extra):
+    """按筛选条件分页返回维修记录（stream=1 时流式输出）；参数无效时抛出 ListQueryError"""
+    limit = parse_limit(request.args, default=default_limit)
+    projection = REPAIR_FIELDS.parse(request.args)
+    base_filters = filters.copy()
+    filters.after(REPAIR_SORT, request.args.get('after'), descending=True)
+
+    def sort_key(row):
+        return [projection.value(row, 'report_date') or '', projection.value(row, 'id')]
+
+    conn = connect()
+    cursor = conn.cursor()
+    if total is None and parse_flag(request.args, 'include_total'):
+        cursor.execute("SELECT COUNT(*) FROM repair_records" + base_filters.where(), base_filters.params)
+        total = cursor.fetchone()[0]
+    if total is not None:
+        extra['total'] = total
+    cursor.execute(
+        "SELECT " + projection.sql + " FROM repair_records"
+        + filters.where() + order_by(REPAIR_SORT, descending=True) + limit_clause(limit),
+        filters.params,
+    )
+    if parse_flag(request.args, 'stream'):
+        return stream_page('repair_records', conn, cursor, projection.record, limit, sort_key, extra)
+    rows, next_cursor = page_rows(cursor.fetchall(), limit, sort_key)
+    conn.close()
+
+    result = {'repair_records': [projection.record(row) for row in rows], 'next_cursor': next_cursor}
+    result.update(extra)
+    return jsonify(result)
+
+
 @repair_bp.route('/repair-records', methods=['GET'])
 @token_required
+@conditional_get('repair_records')
 def api_list_repair_records(current_user):
+    try:
+        return _repair_page(repair_filters(request.args))
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _repair_facets(args):
+    """一次 GROUP BY 得到各状态、各类型的计数以及符合全部筛选条件的总数"""
+    filters = repair_filters(args, exclude=REPAIR_FACETS)
     conn = connect()
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT 
-            id, building, room_no, repair_type, description, 
-            report_date, report_by, status,
-            repair_date, repair_cost, repair_person, remarks
-        FROM repair_records
-        ORDER BY report_date DESC
-        """
+        "SELECT status, repair_type, COUNT(*) FROM repair_records"
+        + filters.where() + " GROUP BY status, repair_type",
+        filters.params,
     )
-    rows = cursor.fetchall()
+    groups = cursor.fetchall()
     conn.close()
 
-    records = []
-    for row in rows:
-        records.append({
-            'id': row[0],
-            'building': row[1],
-            'room_no': row[2],
-            'repair_type': row[3],
-            'description': row[4],
-            'report_date': row[5],
-            'report_by': row[6],
-            'status': row[7],
-            'repair_date': row[8],
-            'repair_cost': row[9],
-            'repair_person': row[10],
-            'remarks': row[11],
-        })
-
-    return jsonify({'repair_records': records})
+    wanted = {f: args.get(f) or None for f in REPAIR_FACETS}
+    facets = {f: {} for f in REPAIR_FACETS}
+    total = 0
+    for status, repair_type, count in groups:
+        values = {'status': status, 'repair_type': repair_type}
+        matched = [f for f in REPAIR_FACETS if wanted[f] is None or values[f] == wanted[f]]
+        for f in REPAIR_FACETS:
+            # 其余维度的筛选都满足时才计入该维度
+            if all(g in matched for g in REPAIR_FACETS if g != f):
+                key = values[f] or ''
+                facets[f][key] = facets[f].get(key, 0) + count
+        if len(matched) == len(REPAIR_FACETS):
+            total += count
+    return facets, total
+
+
+@repair_bp.route('/repair-records/query', methods=['GET'])
+@token_required
+@conditional_get('repair_records')
+def api_query_repair_records(current_user):
+    """按状态、类型、楼栋、房号、维修人、报修日期筛选，分页返回记录及分面统计"""
+    facets, total = _repair_facets(request.args)
+    try:
+        return _repair_page(repair_filters(request.args), default_limit=50, total=total, facets=facets)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @repair_bp.route('/repair-records/<int:record_id>', methods=['GET'])
 @token_required
+@conditional_get('repair_records')
 def api_get_repair_record(current_user, record_id):
+    try:
+        projection = REPAIR_DETAIL_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = connect()
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT 
-            id, building, room_no, repair_type, description, 
-            report_date, report_by, status,
-            repair_date, repair_cost, repair_person, remarks
-        FROM repair_records
-        WHERE id = ?
-        """,
+        "SELECT " + projection.sql + " FROM repair_records WHERE id = ?",
         (record_id,),
     )
     row = cursor.fetchone()
@@ -70,26 +151,12 @@ def api_get_repair_record(current_user, record_id):
     if not row:
         return jsonify({'error': f'维修记录 {record_id} 不存在'}), 404
 
-    record = {
-        'id': row[0],
-        'building': row[1],
-        'room_no': row[2],
-        'repair_type': row[3],
-        'description': row[4],
-        'report_date': row[5],
-        'report_by': row[6],
-        'status': row[7],
-        'repair_date': row[8],
-        'repair_cost': row[9],
-        'repair_person': row[10],
-        'remarks': row[11],
-    }
-
-    return jsonify({'repair_record': record})
+    return jsonify({'repair_record': projection.record(row)})
 
 
 @repair_bp.route('/repair-records', methods=['POST'])
 @token_required
+@invalidates('repair_records')
 def api_add_repair_record(current_user):
     data = request.json
     required_fields = ['room_no', 'repair_type', 'description', 'report_by']
@@ -148,6 +215,7 @@ def api_add_repair_record(current_user):
 
 @repair_bp.route('/repair-records/<int:record_id>', methods=['PUT'])
 @token_required
+@invalidates('repair_records')
 def api_update_repair_record(current_user, record_id):
     data = request.json
     if not data:
@@ -194,6 +262,7 @@ def api_update_repair_record(current_user, record_id):
 
 @repair_bp.route('/repair-records/<int:record_id>', methods=['DELETE'])
 @token_required
+@invalidates('repair_records')
 def api_delete_repair_record(current_user, record_id):
     conn = connect()
     cursor = conn.cursor()
@@ -216,6 +285,7 @@ def api_delete_repair_record(current_user, record_id):
 
 @repair_bp.route('/repair-records/room/<room_no>', methods=['GET'])
 @token_required
+@conditional_get('repair_records', 'rooms')
 def api_get_room_repair_records(current_user, room_no):
     conn = connect()
     cursor = conn.cursor()
@@ -226,36 +296,9 @@ def api_get_room_repair_records(current_user, room_no):
         conn.close()
         return jsonify({'error': f'房间 {room_no} 不存在'}), 404
 
-    cursor.execute(
-        """
-        SELECT 
-            id, building, room_no, repair_type, description, 
-            report_date, report_by, status,
-            repair_date, repair_cost, repair_person, remarks
-        FROM repair_records
-        WHERE room_no = ?
-        ORDER BY report_date DESC
-        """,
-        (room_no,),
-    )
-    rows = cursor.fetchall()
     conn.close()
 
-    records = []
-    for row in rows:
-        records.append({
-            'id': row[0],
-            'building': row[1],
-            'room_no': row[2],
-            'repair_type': row[3],
-            'description': row[4],
-            'report_date': row[5],
-            'report_by': row[6],
-            'status': row[7],
-            'repair_date': row[8],
-            'repair_cost': row[9],
-            'repair_person': row[10],
-            'remarks': row[11],
-        })
-
-    return jsonify({'repair_records': records})
\ No newline at end of file
+    try:
+        return _repair_page(Filters().equal('room_no', room_no))
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
@@ -0,0 +1,158 @@
+"""Cache of serialized GET responses for hot read endpoints.
+
+``@cached(*tables)`` stores the body of a successful response, keyed by
+endpoint and normalized query arguments and tagged with the tables the view
+reads. Lookups go to an in-process LRU first, then to the cross-worker
+``shared_cache``. Both tiers stamp entries with the tables' change
+generations, and correctness comes from that stamp: every lookup, hits
+included, reads ``change_generation`` (one indexed read), so a write from
+any process is seen by the next request. Behind ``conditional_get`` that
+read is shared with the ETag check and costs no extra query. The TTL only
+limits how long an unused entry occupies memory. ``@invalidates(*tables)``
+on write views also drops this process's entries right away. Sizes come
+from ``RESPONSE_CACHE_SIZE`` / ``RESPONSE_CACHE_TTL``.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+import shared_cache
+from conditional import generation_stamp
+
+
+class ResponseCache:
+    """Bounded LRU with a TTL and per-table invalidation; a hit also requires the current stamp."""
+
+    def __init__(self, max_entries=256, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tags, body, mimetype, stamp)
+        self._versions = {}  # table -> invalidation count, guards against racing writes
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[4] != stamp:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def versions(self, tags):
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tags)
+
+    def put(self, key, tags, body, mimetype, stamp, versions):
+        """Store an entry unless one of its tables was invalidated since ``versions`` was taken."""
+        with self._lock:
+            if tuple(self._versions.get(t, 0) for t in tags) != versions:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), body, mimetype, stamp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+            stale = [k for k, entry in self._entries.items() if entry[1] & tables]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+cache = ResponseCache()
+
+
+def init_app(app):
+    cache.max_entries = app.config.setdefault('RESPONSE_CACHE_SIZE', 256)
+    cache.ttl = app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+
+
+def _cache_key():
+    # 参数顺序不同的同一查询共用一个缓存项
+    return (request.endpoint, tuple(sorted(request.view_args.items())),
+            tuple(sorted(request.args.items(multi=True))))
+
+
+def _respond(body, mimetype):
+    response = make_response(body, 200)
+    response.mimetype = mimetype
+    return response
+
+
+def cached(*tables):
+    """Serve repeated identical GETs from the cache; ``tables`` are what the view reads."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+            try:
+                stamp = generation_stamp(tables)
+            except sqlite3.OperationalError:
+                # change_generation 尚未创建（未迁移），不缓存
+                return f(*args, **kwargs)
+            key = _cache_key()
+            entry = cache.get(key, stamp)
+            if entry is not None:
+                return _respond(entry[2], entry[3])
+
+            versions = cache.versions(tables)
+            shared_key = 'response:' + repr(key)
+            shared = shared_cache.get(shared_key, stamp)
+            if shared is not None:
+                cache.put(key, tables, shared[0], shared[1], stamp, versions)
+                return _respond(*shared)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                body = response.get_data()
+                cache.put(key, tables, body, response.mimetype, stamp, versions)
+                shared_cache.put(shared_key, stamp, body, response.mimetype)
+            return response
+        return decorated
+    return decorator
+
+
+def invalidates(*tables):
+    """Drop cached responses that read any of ``tables`` once the write view has run."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            finally:
+                cache.invalidate(tables)
+        return decorated
+    return decorator
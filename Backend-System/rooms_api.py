@@ -5,64 +5,82 @@ from flask import Blueprint, request, jsonify
 
 from auth_api import token_required
 from common import connect
+from conditional import conditional_get
+from response_cache import cached, invalidates
+from occupancy import refresh_rooms
+from tenants_api import TENANT_FIELDS
+from listing import (
+    FieldSet, Filters, ListQueryError, limit_clause, order_by, page_rows, parse_flag, parse_limit,
+)
 
 
 rooms_bp = Blueprint('rooms', __name__, url_prefix='/api')
 
+ROOM_FIELDS = FieldSet(
+    [
+        ('id', 'r.id'), ('room_no', 'r.room_no'), ('building', 'r.building'), ('floor', 'r.floor'),
+        ('room_type', 'r.room_type'), ('price', 'r.price'), ('status', 'r.status'),
+        ('tenant_count', 'r.occupant_count'),
+    ],
+    required=['room_no'],
+)
+
+ROOM_TENANT_FIELDS = FieldSet(
+    TENANT_FIELDS.columns.items(),
+    default=['id', 'name', 'id_card', 'phone', 'gender', 'check_in_date', 'check_out_date', 'status'],
+)
+
 
 @rooms_bp.route('/rooms', methods=['GET'])
 @token_required
+@conditional_get('rooms')
+@cached('rooms')
 def api_list_rooms(current_user):
+    try:
+        limit = parse_limit(request.args)
+        projection = ROOM_FIELDS.parse(request.args)
+        filters = Filters()
+        filters.equal('r.building', request.args.get('building'))
+        filters.equal('r.status', request.args.get('status'))
+        filters.equal('r.room_type', request.args.get('room_type'))
+        filters.equal('r.floor', request.args.get('floor'))
+        base_filters = filters.copy()
+        filters.after(['r.room_no'], request.args.get('after'))
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = connect()
     cursor = conn.cursor()
     cursor.execute(
-        """
-    SELECT
-        r.id,
-        r.room_no,
-        r.building,
-        r.floor,
-        r.room_type,
-        r.price,
-        CASE
-            WHEN EXISTS (
-                SELECT 1 FROM tenants t
-                WHERE t.room_id = r.id
-                  AND t.status = '在住'
-                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-            ) THEN '已入住'
-            ELSE '空闲'
-        END AS current_status,
-        (SELECT COUNT(*) FROM tenants t
-         WHERE t.room_id = r.id
-           AND t.status = '在住'
-           AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date) AS tenant_count
-    FROM rooms r
-    ORDER BY r.room_no
-    """
+        "SELECT " + projection.sql + " FROM rooms r"
+        + filters.where() + order_by(['r.room_no']) + limit_clause(limit),
+        filters.params,
     )
-    rows = cursor.fetchall()
+    rows, next_cursor = page_rows(cursor.fetchall(), limit, lambda row: [projection.value(row, 'room_no')])
+    total = None
+    if parse_flag(request.args, 'include_total'):
+        cursor.execute("SELECT COUNT(*) FROM rooms r" + base_filters.where(), base_filters.params)
+        total = cursor.fetchone()[0]
     conn.close()
 
-    rooms = []
-    for row in rows:
-        rooms.append({
-            'id': row[0],
-            'room_no': row[1],
-            'building': row[2],
-            'floor': row[3],
-            'room_type': row[4],
-            'price': row[5],
-            'status': row[6],
-            'tenant_count': row[7],
-        })
+    rooms = [projection.record(row) for row in rows]
 
-    return jsonify({'rooms': rooms})
+    result = {'rooms': rooms, 'next_cursor': next_cursor}
+    if total is not None:
+        result['total'] = total
+    return jsonify(result)
 
 
 @rooms_bp.route('/rooms/<room_no>/tenants', methods=['GET'])
 @token_required
+@conditional_get('rooms', 'tenants')
+@cached('rooms', 'tenants')
 def api_get_room_tenants(current_user, room_no):
+    try:
+        projection = ROOM_TENANT_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = connect()
     cursor = conn.cursor()
     cursor.execute("SELECT id FROM rooms WHERE room_no = ?", (room_no,))
@@ -73,35 +91,23 @@ def api_get_room_tenants(current_user, room_no):
 
     room_id = room[0]
     cursor.execute(
-        """
-        SELECT id, name, id_card, phone, gender, check_in_date, check_out_date, status
-        FROM tenants 
-        WHERE room_id = ? AND status = '在住'
-        ORDER BY name
+        "SELECT " + projection.sql + """
+        FROM tenants t
+        LEFT JOIN rooms r ON t.room_id = r.id
+        WHERE t.room_id = ? AND t.status = '在住'
+        ORDER BY t.name
         """,
         (room_id,),
     )
-    tenants_data = cursor.fetchall()
+    tenants = [projection.record(row) for row in cursor.fetchall()]
     conn.close()
 
-    tenants = []
-    for tenant in tenants_data:
-        tenants.append({
-            'id': tenant[0],
-            'name': tenant[1],
-            'id_card': tenant[2],
-            'phone': tenant[3],
-            'gender': tenant[4],
-            'check_in_date': tenant[5],
-            'check_out_date': tenant[6],
-            'status': tenant[7],
-        })
-
     return jsonify({'tenants': tenants})
 
 
 @rooms_bp.route('/rooms/<room_no>/checkout', methods=['POST'])
 @token_required
+@invalidates('rooms', 'tenants')
 def api_checkout_room(current_user, room_no):
     conn = connect()
     cursor = conn.cursor()
@@ -125,22 +131,7 @@ def api_checkout_room(current_user, room_no):
         cursor.execute("UPDATE tenants SET status = '已退租' WHERE id = ?", (tenant_id,))
         tenant_names.append(tenant_name)
 
-    cursor.execute(
-        """
-    UPDATE rooms
-    SET status = CASE
-        WHEN EXISTS (
-            SELECT 1 FROM tenants t
-            WHERE t.room_id = rooms.id
-              AND t.status = '在住'
-              AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-        ) THEN '已入住'
-        ELSE '空闲'
-    END
-    WHERE id = ?
-    """,
-        (room_id,),
-    )
+    refresh_rooms(cursor, [room_id])
     conn.commit()
     conn.close()
 
@@ -149,6 +140,7 @@ def api_checkout_room(current_user, room_no):
 
 @rooms_bp.route('/rooms', methods=['POST'])
 @token_required
+@invalidates('rooms')
 def api_add_room(current_user):
     data = request.json
     if not data or not all(k in data for k in ('room_no', 'floor', 'room_type', 'price')):
@@ -181,6 +173,7 @@ def api_add_room(current_user):
 
 @rooms_bp.route('/rooms/<room_no>', methods=['PUT'])
 @token_required
+@invalidates('rooms')
 def api_update_room(current_user, room_no):
     data = request.json
     if not data:
@@ -215,6 +208,7 @@ def api_update_room(current_user, room_no):
 
 @rooms_bp.route('/rooms/<int:room_id>', methods=['DELETE'])
 @token_required
+@invalidates('rooms')
 def api_delete_room(current_user, room_id):
     conn = connect()
     cursor = conn.cursor()
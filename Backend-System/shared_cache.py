@@ -0,0 +1,120 @@
+"""Cache tier shared by all worker processes, stored in ``sql/cache.db``.
+
+Every entry carries a stamp: the ``change_generation`` vector of the tables
+its value was computed from (see ``conditional.generation_stamp``). A lookup
+only hits when the stamp still matches, so a write made by any worker, or by
+``lease_sweeper``, invalidates the entry for every process at once. A value
+computed by one worker is served to the others without recomputing it.
+
+The cache database is disposable: it is created on first use, and any
+SQLite error is treated as a miss so a busy or damaged cache file never
+fails a request.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import common
+
+
+logger = logging.getLogger('shared_cache')
+
+# 条目上限与最长保留时间；有效性由版本戳保证，TTL 只用于回收空间
+MAX_ENTRIES = 2000
+TTL = 600
+# 每写入这么多次清理一次过期与超额条目
+PRUNE_EVERY = 100
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+_puts = 0
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        os.makedirs(os.path.dirname(common.CACHE_DB_NAME), exist_ok=True)
+        conn = sqlite3.connect(common.CACHE_DB_NAME, timeout=1, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        # 缓存内容可随时重建，无需每次写入都落盘
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                stamp TEXT NOT NULL,
+                value BLOB NOT NULL,
+                mimetype TEXT,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at)")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def get(key, stamp):
+    """Return ``(value, mimetype)`` when ``key`` is cached under ``stamp``, else ``None``."""
+    try:
+        row = _conn().execute(
+            "SELECT value, mimetype FROM cache_entries WHERE key = ? AND stamp = ? AND expires_at > ?",
+            (key, stamp, time.time()),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.debug("共享缓存读取失败: %s", e)
+        _count('errors')
+        return None
+    _count('hits' if row else 'misses')
+    return (bytes(row[0]), row[1]) if row else None
+
+
+def put(key, stamp, value, mimetype=None, ttl=None):
+    global _puts
+    try:
+        conn = _conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, stamp, value, mimetype, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (key, stamp, value, mimetype, time.time() + (ttl or TTL)),
+        )
+        _count('stores')
+        _puts += 1
+        if _puts % PRUNE_EVERY == 0:
+            prune(conn)
+    except sqlite3.Error as e:
+        logger.debug("共享缓存写入失败: %s", e)
+        _count('errors')
+
+
+def prune(conn=None):
+    """Drop expired entries, then the ones closest to expiry beyond ``MAX_ENTRIES``."""
+    conn = conn or _conn()
+    conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+    conn.execute(
+        """
+        DELETE FROM cache_entries WHERE key IN (
+            SELECT key FROM cache_entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (MAX_ENTRIES,),
+    )
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    try:
+        result['entries'] = _conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+    except sqlite3.Error:
+        result['entries'] = None
+    result['max_entries'] = MAX_ENTRIES
+    return result
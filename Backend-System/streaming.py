@@ -0,0 +1,55 @@
+"""Streamed JSON list responses (``stream=1`` on the large list endpoints).
+
+``stream_page`` encodes rows as they come off the cursor, in ``fetchmany``
+batches, so a large listing is never held as one list of dicts or one JSON
+string. The body has the same shape as the buffered response:
+``{"<key>": [...], "next_cursor": ..., ...}``. Because the next cursor is only
+known once the page has been read, it is written after the items.
+"""
+from flask import current_app, stream_with_context
+
+from listing import encode_cursor
+
+
+BATCH_SIZE = 500
+
+
+def stream_page(key, conn, cursor, record, limit=None, cursor_of=None, extra=None, batch_size=BATCH_SIZE):
+    """Stream rows of an executed ``cursor`` (fetched with ``limit_clause``) as a JSON page.
+
+    ``record`` turns a row into a dict and ``cursor_of`` a row into its sort
+    key values, as for ``page_rows``. ``conn`` is closed once the body has been sent.
+    """
+    encode = current_app.json.dumps_bytes
+
+    def generate():
+        try:
+            yield b'{' + encode(key) + b':['
+            sent = 0
+            last = None
+            next_cursor = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if limit and sent + len(rows) > limit:
+                    # 多取的那一行只用于判断是否还有下一页
+                    rows = rows[:limit - sent]
+                    next_cursor = cursor_of(rows[-1] if rows else last)
+                # 每批编码一次，去掉外层方括号后拼接
+                chunk = encode([record(row) for row in rows])[1:-1]
+                if chunk:
+                    yield (b',' if sent else b'') + chunk
+                sent += len(rows)
+                last = rows[-1] if rows else last
+                if next_cursor is not None:
+                    break
+            tail = {'next_cursor': None if next_cursor is None else encode_cursor(next_cursor)}
+            tail.update(extra or {})
+            yield b'],' + encode(tail)[1:] + b'\n'
+        finally:
+            cursor.close()
+            conn.close()
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
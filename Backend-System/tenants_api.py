@@ -5,109 +5,172 @@ from flask import Blueprint, request, jsonify
 
 from auth_api import token_required
 from common import connect
+from conditional import conditional_get
+from response_cache import invalidates
+from occupancy import refresh_rooms
+import lease_sweeper
+from streaming import stream_page
+from listing import (
+    FieldSet, Filters, ListQueryError, fts_match, like_contains, limit_clause, order_by,
+    page_rows, parse_flag, parse_limit, split_search_terms,
+)
 
 
 tenants_bp = Blueprint('tenants', __name__, url_prefix='/api')
 
 
+# 列表排序键：房号（无房间时为空串）、姓名、ID
+TENANT_SORT = ["COALESCE(r.room_no, '')", 't.name', 't.id']
+
+# fields= 可选字段；未传时返回全部列（与原接口一致），表格视图可用 fields= 只取所需列
+TENANT_FIELDS = FieldSet(
+    [
+        ('id', 't.id'), ('name', 't.name'), ('gender', 't.gender'), ('nation', 't.nation'),
+        ('birth_date', 't.birth_date'), ('id_card', 't.id_card'), ('address', 't.address'),
+        ('issuing_authority', 't.issuing_authority'), ('valid_from', 't.valid_from'),
+        ('valid_to', 't.valid_to'), ('phone', 't.phone'),
+        ('emergency_contact_name', 't.emergency_contact_name'),
+        ('emergency_contact_phone', 't.emergency_contact_phone'),
+        ('check_in_date', 't.check_in_date'), ('check_out_date', 't.check_out_date'),
+        ('room_no', 'r.room_no'), ('building', 'r.building'), ('remarks', 't.remarks'),
+        ('status', 't.status'), ('front_img', 't.front_img'), ('back_img', 't.back_img'),
+    ],
+    required=['room_no', 'name', 'id', 'id_card'],
+)
+
+TENANT_SEARCH_FIELDS = FieldSet(
+    TENANT_FIELDS.columns.items(),
+    default=['id', 'name', 'gender', 'id_card', 'phone', 'room_no', 'building',
+             'check_in_date', 'check_out_date', 'status'],
+)
+
+
+def tenant_filters(args):
+    """租户列表的筛选条件（列表接口与导出共用）"""
+    filters = Filters()
+    filters.equal('t.status', args.get('status'))
+    filters.equal('r.building', args.get('building'))
+    filters.equal('r.room_no', args.get('room_no'))
+    filters.date_range('t.check_in_date', args.get('check_in_from'), args.get('check_in_to'))
+    filters.date_range('t.check_out_date', args.get('check_out_from'), args.get('check_out_to'))
+    return filters
+
+
 @tenants_bp.route('/tenants', methods=['GET'])
 @token_required
+@conditional_get('tenants', 'rooms')
 def api_list_tenants(current_user):
+    # 只读：到期退租与房间状态由 lease_sweeper 按天执行
+    try:
+        limit = parse_limit(request.args)
+        projection = TENANT_FIELDS.parse(request.args)
+        filters = tenant_filters(request.args)
+        base_filters = filters.copy()
+        filters.after(TENANT_SORT, request.args.get('after'))
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def sort_key(row):
+        return [projection.value(row, 'room_no') or '', projection.value(row, 'name'), projection.value(row, 'id')]
+
     conn = connect()
     cursor = conn.cursor()
-
-    # 尝试进行自动状态更新；若数据库繁忙（锁定），则跳过更新以保证查询可用
-    try:
+    total = None
+    if parse_flag(request.args, 'include_total'):
         cursor.execute(
-            """
-            UPDATE tenants 
-            SET status = '已退租' 
-            WHERE status = '在住' AND DATE('now') > check_out_date
-            """
+            "SELECT COUNT(*) FROM tenants t LEFT JOIN rooms r ON t.room_id = r.id" + base_filters.where(),
+            base_filters.params,
         )
-        conn.commit()
-    except sqlite3.OperationalError as e:
-        # 数据库锁定时不阻塞列表请求
-        if 'locked' in str(e).lower():
-            pass
-        else:
-            conn.close()
-            return jsonify({'error': str(e)}), 500
+        total = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT " + projection.sql + " FROM tenants t LEFT JOIN rooms r ON t.room_id = r.id"
+        + filters.where() + order_by(TENANT_SORT) + limit_clause(limit),
+        filters.params,
+    )
+    if parse_flag(request.args, 'stream'):
+        extra = {'total': total} if total is not None else None
+        return stream_page('tenants', conn, cursor, projection.record, limit, sort_key, extra)
+    rows, next_cursor = page_rows(cursor.fetchall(), limit, sort_key)
+    conn.close()
+
+    tenants = [projection.record(row) for row in rows]
+
+    result = {'tenants': tenants, 'next_cursor': next_cursor}
+    if total is not None:
+        result['total'] = total
+    return jsonify(result)
+
 
+@tenants_bp.route('/tenants/search', methods=['GET'])
+@token_required
+@conditional_get('tenants', 'rooms')
+def api_search_tenants(current_user):
+    """按姓名、手机号、身份证号、地址、备注检索租户（支持号码片段），按相关度排序"""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': '缺少搜索关键词 q'}), 400
     try:
-        cursor.execute(
-            """
-            UPDATE rooms
-            SET status = CASE
-                WHEN EXISTS (
-                    SELECT 1 FROM tenants t
-                    WHERE t.room_id = rooms.id
-                      AND t.status = '在住'
-                      AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-                ) THEN '已入住'
-                ELSE '空闲'
-            END
-            """
+        limit = parse_limit(request.args, default=20, maximum=100)
+        projection = TENANT_SEARCH_FIELDS.parse(request.args)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    fts_terms, short_terms = split_search_terms(q)
+    filters = Filters()
+    filters.equal('t.status', request.args.get('status'))
+    # 不足 3 个字符的关键词（如两字姓名）无法走 trigram 索引，改为 LIKE 匹配
+    for term in short_terms:
+        pattern = like_contains(term)
+        filters.add(
+            "(t.name LIKE ? ESCAPE '\\' OR t.phone LIKE ? ESCAPE '\\'"
+            " OR t.id_card LIKE ? ESCAPE '\\' OR t.address LIKE ? ESCAPE '\\')",
+            pattern, pattern, pattern, pattern,
         )
-        conn.commit()
-    except sqlite3.OperationalError as e:
-        if 'locked' in str(e).lower():
-            pass
-        else:
-            conn.close()
-            return jsonify({'error': str(e)}), 500
+    if fts_terms:
+        source = "FROM tenants_fts f JOIN tenants t ON t.id = f.rowid"
+        filters.add("tenants_fts MATCH ?", fts_match(fts_terms))
+        ranking = " ORDER BY f.rank"
+    else:
+        source = "FROM tenants t"
+        ranking = " ORDER BY t.status = '在住' DESC, t.name"
 
+    conn = connect()
+    cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT t.id, t.name, t.gender, t.nation, t.birth_date, t.id_card, 
-               t.address, t.issuing_authority, t.valid_from, t.valid_to,
-               t.phone, t.emergency_contact_name, t.emergency_contact_phone, 
-               t.check_in_date, t.check_out_date, r.room_no, r.building, t.remarks, t.status,
-               t.front_img, t.back_img
-        FROM tenants t
-        LEFT JOIN rooms r ON t.room_id = r.id
-        ORDER BY r.room_no, t.name
-        """
+        "SELECT " + projection.sql + " " + source + " LEFT JOIN rooms r ON t.room_id = r.id"
+        + filters.where() + ranking + " LIMIT ?",
+        filters.params + [limit],
     )
-    rows = cursor.fetchall()
+    tenants = [projection.record(row) for row in cursor.fetchall()]
     conn.close()
 
-    tenants = []
-    for row in rows:
-        tenants.append({
-            'id': row[0],
-            'name': row[1],
-            'gender': row[2],
-            'nation': row[3],
-            'birth_date': row[4],
-            'id_card': row[5],
-            'address': row[6],
-            'issuing_authority': row[7],
-            'valid_from': row[8],
-            'valid_to': row[9],
-            'phone': row[10],
-            'emergency_contact_name': row[11],
-            'emergency_contact_phone': row[12],
-            'check_in_date': row[13],
-            'check_out_date': row[14],
-            'room_no': row[15],
-            'building': row[16],
-            'remarks': row[17],
-            'status': row[18],
-            'front_img': row[19],
-            'back_img': row[20],
-        })
-
-    return jsonify({'tenants': tenants})
+    return jsonify({'tenants': tenants, 'q': q})
+
+
+@tenants_bp.route('/tenants/sweep', methods=['POST'])
+@token_required
+@invalidates('tenants', 'rooms')
+def api_sweep_expired_tenants(current_user):
+    """立即执行一次租期到期扫描（通常由 lease_sweeper 每日自动执行）"""
+    try:
+        expired, rooms = lease_sweeper.sweep()
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e).lower():
+            return jsonify({'error': '数据库繁忙，请稍后重试'}), 503
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'message': '租期扫描完成', 'checked_out': expired, 'rooms_updated': rooms})
 
 
 @tenants_bp.route('/tenants/<id_card>/checkout', methods=['POST'])
 @token_required
+@invalidates('tenants', 'rooms')
 def api_checkout_tenant(current_user, id_card):
     conn = connect()
     cursor = conn.cursor()
 
     today = date.today().isoformat()
+    cursor.execute("SELECT room_id FROM tenants WHERE id_card = ? AND status = '在住'", (id_card,))
+    room_ids = [r[0] for r in cursor.fetchall()]
     cursor.execute(
         """
     UPDATE tenants
@@ -121,37 +184,64 @@ def api_checkout_tenant(current_user, id_card):
         conn.close()
         return jsonify({'error': '未找到该租户或租户已退租'}), 404
 
-    conn.commit()
-
-    cursor.execute(
-        """
-        UPDATE rooms
-        SET status = CASE
-            WHEN EXISTS (
-                SELECT 1 FROM tenants t
-                WHERE t.room_id = rooms.id
-                  AND t.status = '在住'
-                  AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-            ) THEN '已入住'
-            ELSE '空闲'
-        END
-        """
-    )
+    refresh_rooms(cursor, room_ids)
     conn.commit()
     conn.close()
 
     return jsonify({'message': '租户退租成功', 'checkout_date': today})
 
 
+TENANT_REQUIRED_FIELDS = [
+    'name', 'gender', 'id_card', 'phone',
+    'emergency_contact_name', 'emergency_contact_phone',
+    'check_in_date', 'check_out_date', 'room_no',
+]
+
+TENANT_INSERT = """
+    INSERT INTO tenants (
+        name, gender, nation, birth_date, id_card, address, issuing_authority,
+        valid_from, valid_to, front_img, back_img,
+        phone, emergency_contact_name, emergency_contact_phone,
+        check_in_date, check_out_date, room_id, remarks, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, '在住')
+"""
+
+# 批量入住单次最多行数
+BULK_MAX_ROWS = 500
+
+
+def tenant_insert_params(data, room_id):
+    """``TENANT_INSERT`` 的参数（单个新增与批量入住共用）"""
+    return (
+        data['name'],
+        data['gender'],
+        data.get('nation', '汉族'),
+        data.get('birth_date', None),
+        data['id_card'],
+        data.get('address', ''),
+        # 前端可能以 issuer 传入，这里兼容映射至 issuing_authority
+        data.get('issuing_authority', data.get('issuer', '')),
+        # 兼容 valid_start/valid_end 映射至 valid_from/valid_to
+        data.get('valid_from', data.get('valid_start', None)),
+        data.get('valid_to', data.get('valid_end', None)),
+        data.get('front_img', ''),
+        data.get('back_img', ''),
+        data['phone'],
+        data['emergency_contact_name'],
+        data['emergency_contact_phone'],
+        data['check_in_date'],
+        data['check_out_date'],
+        room_id,
+        data.get('remarks', ''),
+    )
+
+
 @tenants_bp.route('/tenants', methods=['POST'])
 @token_required
+@invalidates('tenants', 'rooms')
 def api_add_tenant(current_user):
     data = request.json
-    required_fields = [
-        'name', 'gender', 'id_card', 'phone',
-        'emergency_contact_name', 'emergency_contact_phone',
-        'check_in_date', 'check_out_date', 'room_no',
-    ]
+    required_fields = TENANT_REQUIRED_FIELDS
 
     if not data or not all(k in data for k in required_fields):
         return jsonify({'error': '缺少必要参数', 'required': required_fields}), 400
@@ -165,67 +255,216 @@ def api_add_tenant(current_user):
         return jsonify({'error': f"房间 {data['room_no']} 不存在"}), 404
 
     room_id = room[0]
-    remarks = data.get('remarks', '')
 
     try:
+        cursor.execute(TENANT_INSERT, tenant_insert_params(data, room_id))
+        refresh_rooms(cursor, [room_id])
+        conn.commit()
+        conn.close()
+        return jsonify({'message': f"租户 {data['name']} 已添加", 'id_card': data['id_card']})
+    except sqlite3.Error as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
+
+@tenants_bp.route('/tenants/bulk', methods=['POST'])
+@token_required
+@invalidates('tenants', 'rooms')
+def api_bulk_add_tenants(current_user):
+    """批量入住：全部校验通过后在一个事务内写入，任一行有误则整批不写入"""
+    data = request.json
+    rows = data.get('tenants') if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': '请提供租户列表 tenants'}), 400
+    if len(rows) > BULK_MAX_ROWS:
+        return jsonify({'error': f'单次最多批量入住 {BULK_MAX_ROWS} 人'}), 400
+
+    results = [{'index': i, 'id_card': row.get('id_card') if isinstance(row, dict) else None}
+               for i, row in enumerate(rows)]
+    errors = {}
+    seen = {}
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[i] = '数据格式错误'
+            continue
+        missing = [k for k in TENANT_REQUIRED_FIELDS if not row.get(k)]
+        if missing:
+            errors[i] = f"缺少必要参数: {', '.join(missing)}"
+        elif row['id_card'] in seen:
+            errors[i] = f"身份证号与第 {seen[row['id_card']] + 1} 行重复"
+        else:
+            seen[row['id_card']] = i
+
+    conn = connect()
+    cursor = conn.cursor()
+    # 房号与已存在的身份证号各用一次查询解析
+    room_nos = sorted({row['room_no'] for i, row in enumerate(rows) if i not in errors})
+    rooms = {}
+    if room_nos:
         cursor.execute(
-            """
-            INSERT INTO tenants (
-                name, gender, nation, birth_date, id_card, address, issuing_authority,
-                valid_from, valid_to, front_img, back_img,
-                phone, emergency_contact_name, emergency_contact_phone,
-                check_in_date, check_out_date, room_id, remarks, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, '在住')
-            """,
-            (
-                data['name'],
-                data['gender'],
-                data.get('nation', '汉族'),
-                data.get('birth_date', None),
-                data['id_card'],
-                data.get('address', ''),
-                # 前端可能以 issuer 传入，这里兼容映射至 issuing_authority
-                data.get('issuing_authority', data.get('issuer', '')),
-                # 兼容 valid_start/valid_end 映射至 valid_from/valid_to
-                data.get('valid_from', data.get('valid_start', None)),
-                data.get('valid_to', data.get('valid_end', None)),
-                data.get('front_img', ''),
-                data.get('back_img', ''),
-                data['phone'],
-                data['emergency_contact_name'],
-                data['emergency_contact_phone'],
-                data['check_in_date'],
-                data['check_out_date'],
-                room_id,
-                remarks,
-            ),
+            f"SELECT room_no, id FROM rooms WHERE room_no IN ({', '.join('?' for _ in room_nos)})",
+            room_nos,
         )
-        conn.commit()
+        rooms = dict(cursor.fetchall())
+    id_cards = list(seen)
+    existing = set()
+    if id_cards:
+        cursor.execute(
+            f"SELECT id_card FROM tenants WHERE id_card IN ({', '.join('?' for _ in id_cards)})",
+            id_cards,
+        )
+        existing = {r[0] for r in cursor.fetchall()}
+    for i, row in enumerate(rows):
+        if i in errors:
+            continue
+        if row['room_no'] not in rooms:
+            errors[i] = f"房间 {row['room_no']} 不存在"
+        elif row['id_card'] in existing:
+            errors[i] = f"身份证号 {row['id_card']} 已登记"
+
+    if errors:
+        conn.close()
+        for i, error in errors.items():
+            results[i]['error'] = error
+        for result in results:
+            result['ok'] = result['index'] not in errors
+        return jsonify({'error': f'{len(errors)} 行数据有误，未写入任何记录', 'results': results}), 400
 
+    try:
+        cursor.executemany(TENANT_INSERT, [tenant_insert_params(row, rooms[row['room_no']]) for row in rows])
+        refresh_rooms(cursor, {rooms[row['room_no']] for row in rows})
         cursor.execute(
-            """
-            UPDATE rooms
-            SET status = CASE
-                WHEN EXISTS (
-                    SELECT 1 FROM tenants t
-                    WHERE t.room_id = rooms.id
-                      AND t.status = '在住'
-                      AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-                ) THEN '已入住'
-                ELSE '空闲'
-            END
-            """
+            f"SELECT id_card, id FROM tenants WHERE id_card IN ({', '.join('?' for _ in id_cards)})",
+            id_cards,
         )
+        ids = dict(cursor.fetchall())
         conn.commit()
+    except sqlite3.Error as e:
         conn.close()
-        return jsonify({'message': f"租户 {data['name']} 已添加", 'id_card': data['id_card']})
+        return jsonify({'error': str(e)}), 500
+    conn.close()
+
+    for result in results:
+        result.update(ok=True, id=ids.get(result['id_card']))
+    return jsonify({'message': f'已批量入住 {len(rows)} 人', 'created': len(rows), 'results': results}), 201
+
+
+def bulk_selection(data):
+    """批量退租/续租的范围：在住租户中按 id_cards、building、room_nos 选择（同时给出时取交集）"""
+    id_cards = data.get('id_cards')
+    room_nos = data.get('room_nos')
+    building = data.get('building')
+    if not (id_cards or room_nos or building):
+        raise ListQueryError('请指定 id_cards、building 或 room_nos')
+    for name, values in (('id_cards', id_cards), ('room_nos', room_nos)):
+        if values is None:
+            continue
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ListQueryError(f'{name} 须为字符串列表')
+        if len(values) > BULK_MAX_ROWS:
+            raise ListQueryError(f'{name} 单次最多 {BULK_MAX_ROWS} 个')
+
+    filters = Filters().add("status = '在住'")
+    filters.one_of('id_card', id_cards)
+    if room_nos:
+        filters.add(f"room_id IN (SELECT id FROM rooms WHERE room_no IN ({', '.join('?' for _ in room_nos)}))",
+                    *room_nos)
+    if building:
+        filters.add("room_id IN (SELECT id FROM rooms WHERE building = ?)", building)
+    return filters
+
+
+@tenants_bp.route('/tenants/bulk-checkout', methods=['POST'])
+@token_required
+@invalidates('tenants', 'rooms')
+def api_bulk_checkout_tenants(current_user):
+    """批量退租：一条 UPDATE 完成，只重新计算涉及房间的入住状态"""
+    try:
+        filters = bulk_selection(request.json or {})
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT id_card, room_id FROM tenants" + filters.where(), filters.params)
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            return jsonify({'error': '没有符合条件的在住租户'}), 404
+        cursor.execute("UPDATE tenants SET status = '已退租'" + filters.where(), filters.params)
+        refresh_rooms(cursor, {r[1] for r in rows})
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    conn.close()
+
+    return jsonify({
+        'message': f'已退租 {len(rows)} 人',
+        'checked_out': len(rows),
+        'id_cards': [r[0] for r in rows],
+        'checkout_date': date.today().isoformat(),
+    })
+
+
+@tenants_bp.route('/tenants/bulk-renew', methods=['POST'])
+@token_required
+@invalidates('tenants', 'rooms')
+def api_bulk_renew_tenants(current_user):
+    """批量续租：将所选租户的退租日期改为 check_out_date，或顺延 months 个月"""
+    data = request.json or {}
+    try:
+        filters = bulk_selection(data)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    new_date = data.get('check_out_date')
+    months = data.get('months')
+    if bool(new_date) == (months is not None):
+        return jsonify({'error': '请指定 check_out_date（新的退租日期）或 months（顺延月数）其中之一'}), 400
+    if new_date:
+        try:
+            if date.fromisoformat(new_date) < date.today():
+                return jsonify({'error': '新的退租日期不能早于今天'}), 400
+        except (TypeError, ValueError):
+            return jsonify({'error': 'check_out_date 须为 YYYY-MM-DD 格式'}), 400
+        assignment, params = "check_out_date = ?", [new_date]
+    else:
+        if not isinstance(months, int) or isinstance(months, bool) or not 1 <= months <= 120:
+            return jsonify({'error': 'months 须为 1 到 120 之间的整数'}), 400
+        assignment, params = "check_out_date = DATE(check_out_date, ?)", [f'+{months} months']
+
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT id, room_id FROM tenants" + filters.where(), filters.params)
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            return jsonify({'error': '没有符合条件的在住租户'}), 404
+        cursor.execute("UPDATE tenants SET " + assignment + filters.where(), params + filters.params)
+        # 退租日期跨过今天时入住状态会变化，只重算涉及的房间
+        refresh_rooms(cursor, {r[1] for r in rows})
+        ids = [r[0] for r in rows]
+        cursor.execute(
+            f"SELECT id_card, check_out_date FROM tenants WHERE id IN ({', '.join('?' for _ in ids)})", ids
+        )
+        renewed = [{'id_card': r[0], 'check_out_date': r[1]} for r in cursor.fetchall()]
+        conn.commit()
     except sqlite3.Error as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
+    conn.close()
+
+    return jsonify({'message': f'已续租 {len(renewed)} 人', 'renewed': len(renewed), 'tenants': renewed})
 
 
 @tenants_bp.route('/tenants/<id_card>', methods=['PUT'])
 @token_required
+@invalidates('tenants', 'rooms')
 def api_update_tenant(current_user, id_card):
     data = request.json
     if not data:
@@ -255,29 +494,17 @@ def api_update_tenant(current_user, id_card):
     cursor = conn.cursor()
 
     try:
-        for key, value in update_data.items():
-            cursor.execute(f"UPDATE tenants SET {key} = ? WHERE id_card = ?", (value, id_card))
-
-        if cursor.rowcount == 0:
+        cursor.execute("SELECT room_id FROM tenants WHERE id_card = ?", (id_card,))
+        row = cursor.fetchone()
+        if not row:
             conn.close()
             return jsonify({'error': f'租户 {id_card} 不存在'}), 404
 
-        conn.commit()
+        for key, value in update_data.items():
+            cursor.execute(f"UPDATE tenants SET {key} = ? WHERE id_card = ?", (value, id_card))
 
-        cursor.execute(
-            """
-            UPDATE rooms
-            SET status = CASE
-                WHEN EXISTS (
-                    SELECT 1 FROM tenants t
-                    WHERE t.room_id = rooms.id
-                      AND t.status = '在住'
-                      AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-                ) THEN '已入住'
-                ELSE '空闲'
-            END
-            """
-        )
+        # 原房间与新房间（如有换房）
+        refresh_rooms(cursor, [row[0], update_data.get('room_id')])
         conn.commit()
         conn.close()
         return jsonify({'message': f'租户 {id_card} 信息已更新'})
@@ -288,6 +515,7 @@ def api_update_tenant(current_user, id_card):
 
 @tenants_bp.route('/tenants/<id_card>', methods=['DELETE'])
 @token_required
+@invalidates('tenants', 'rooms')
 def api_delete_tenant(current_user, id_card):
     conn = connect()
     cursor = conn.cursor()
@@ -313,27 +541,8 @@ def api_delete_tenant(current_user, id_card):
             conn.close()
             return jsonify({'error': f'租户 {id_card} 不存在'}), 404
 
-        conn.commit()
-
-        # 更新房间状态（如有需要）
         # 仅针对受影响的房间更新状态，降低并发锁竞争
-        if room_id is not None:
-            cursor.execute(
-                """
-                UPDATE rooms
-                SET status = CASE
-                    WHEN EXISTS (
-                        SELECT 1 FROM tenants t
-                        WHERE t.room_id = rooms.id
-                          AND t.status = '在住'
-                          AND DATE('now') BETWEEN t.check_in_date AND t.check_out_date
-                    ) THEN '已入住'
-                    ELSE '空闲'
-                END
-                WHERE id = ?
-                """,
-                (room_id,)
-            )
+        refresh_rooms(cursor, [room_id])
         conn.commit()
         conn.close()
         msg = f'租户 {id_card} 已删除'